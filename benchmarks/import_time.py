@@ -0,0 +1,55 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# root of the repository, the benchmark runs the imports from there
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# statements which are timed in a fresh interpreter (name, setup, statement)
+CASES = [
+  ('import explain', '', 'import explain'),
+  ('Model()', 'import explain', 'explain.Model()'),
+  ('import matplotlib.pyplot', '', 'import matplotlib.pyplot')
+]
+
+# script run in the fresh interpreter, prints the duration and the modules which were loaded
+PROBE = """
+import json, sys, time
+{setup}
+start = time.perf_counter()
+{statement}
+duration = time.perf_counter() - start
+print(json.dumps({{'duration': duration, 'matplotlib': 'matplotlib' in sys.modules, 'models': sorted(m for m in sys.modules if m.startswith('models.'))}}))
+"""
+
+def measure(setup, statement, repeats = 5):
+  # every measurement gets a new interpreter, so nothing is cached in sys.modules
+  results = []
+  for _ in range(repeats):
+    output = subprocess.run([sys.executable, '-c', PROBE.format(setup=setup, statement=statement)], cwd=ROOT, capture_output=True, text=True, check=True)
+    results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+  durations = [result['duration'] for result in results]
+  return {'median_ms': statistics.median(durations) * 1000, 'min_ms': min(durations) * 1000, 'matplotlib': results[-1]['matplotlib'], 'models': results[-1]['models']}
+
+def run(repeats = 5):
+  report = {}
+  for name, setup, statement in CASES:
+    try:
+      report[name] = measure(setup, statement, repeats)
+    except subprocess.CalledProcessError as error:
+      report[name] = {'error': error.stderr.strip().splitlines()[-1]}
+  return report
+
+if __name__ == '__main__':
+  # usage: python benchmarks/import_time.py [repeats] [--json]
+  repeats = [int(arg) for arg in sys.argv[1:] if arg.isdigit()]
+  report = run(repeats[0] if repeats else 5)
+  for name, result in report.items():
+    if 'error' in result:
+      print(f'{name:<26} failed: {result["error"]}')
+    else:
+      print(f'{name:<26} median {result["median_ms"]:8.1f} ms   min {result["min_ms"]:8.1f} ms   matplotlib loaded: {result["matplotlib"]}')
+  if '--json' in sys.argv:
+    print(json.dumps(report, indent=2))
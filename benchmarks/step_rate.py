@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+from time import perf_counter
+
+# the benchmark runs from the root of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from explain import Model
+from synthetic import write_scaled_definition
+
+DEFINITION = os.path.join(ROOT, 'definitions', 'normal_neonate_24h.json')
+
+# the steps per second depend on the machine, benchmarks/baseline.json holds the results of the reference machine (see its python and machine keys)
+# measure a baseline of your own machine before a change with --save my_baseline.json and check the change with --compare my_baseline.json
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+# the scenarios (name, network scale factor, number of watched properties, number of running property changes)
+SCENARIOS = [
+  ('neonate', 1, 0, 0),
+  ('neonate_x10', 10, 0, 0),
+  ('neonate_x100', 100, 0, 0),
+  ('watch_10', 1, 10, 0),
+  ('watch_50', 1, 50, 0),
+  ('prop_changes_10', 1, 0, 10),
+  ('prop_changes_100', 1, 0, 100)
+]
+
+def watch_labels(model, count):
+  # watch the pressures, volumes and flows of the components in definition order
+  labels = []
+  for name in list(model.compliances) + list(model.time_varying_elastances):
+    labels += [name + '.pres', name + '.vol']
+  for name in list(model.resistors) + list(model.valves):
+    labels.append(name + '.flow')
+  return labels[:count]
+
+def run_scenario(definition_file, no_watched, no_prop_changes, duration, warm_up, repeats):
+  # the fastest of the repeats is the least disturbed by the rest of the machine
+  results = [measure(definition_file, no_watched, no_prop_changes, duration, warm_up) for _ in range(repeats)]
+  return max(results, key=lambda result: result['steps_per_second'])
+
+def measure(definition_file, no_watched, no_prop_changes, duration, warm_up):
+  model = Model(definition_file)
+  model.calculate(warm_up)
+
+  for label in watch_labels(model, no_watched):
+    model.io.dc.add_to_watchlist(model.io.find_model_prop(label))
+
+  # ramp the forward resistances by 0.1 percent during the whole run, so all changes are running
+  resistors = list(model.resistors)
+  for index in range(no_prop_changes):
+    label = resistors[index % len(resistors)] + '.r_for'
+    model.io.scheduler.schedule(model.io.find_model_prop(label), model.properties.get(label) * 1.001, duration * 2)
+
+  # the property changes report their start, which is not part of the measurement
+  with contextlib.redirect_stdout(io.StringIO()):
+    start = perf_counter()
+    model.calculate(duration)
+    wall_time = perf_counter() - start
+
+  steps = int(duration / model.modeling_stepsize)
+  return {
+    'compartments': len(model.network.compartments),
+    'connectors': len(model.network.connectors),
+    'watched': no_watched,
+    'prop_changes': no_prop_changes,
+    'steps': steps,
+    'wall_time': wall_time,
+    'steps_per_second': steps / wall_time,
+    'realtime_factor': duration / wall_time
+  }
+
+def run(duration = 5.0, warm_up = 1.0, scenarios = None, repeats = 3):
+  results = {
+    'python': platform.python_version(),
+    'machine': platform.machine(),
+    'duration': duration,
+    'repeats': repeats,
+    'scenarios': {}
+  }
+  with tempfile.TemporaryDirectory() as directory:
+    for name, factor, no_watched, no_prop_changes in SCENARIOS:
+      if scenarios and name not in scenarios:
+        continue
+      definition_file = DEFINITION
+      if factor > 1:
+        definition_file = write_scaled_definition(DEFINITION, factor, os.path.join(directory, f'{name}.json'))
+      results['scenarios'][name] = run_scenario(definition_file, no_watched, no_prop_changes, duration, warm_up, repeats)
+      print_result(name, results['scenarios'][name])
+  return results
+
+def print_result(name, result):
+  print(f"{name:<20}{result['compartments']:>6} comp {result['connectors']:>6} conn {result['steps_per_second']:>12.0f} steps/s {result['realtime_factor']:>9.1f} x realtime")
+
+def compare(results, baseline, tolerance):
+  # compare the steps per second with the baseline, a scenario which is slower than the tolerance allows is a regression
+  regressions = []
+  print(f"{'scenario':<20}{'baseline':>14}{'current':>14}{'change':>9}")
+  for name, result in results['scenarios'].items():
+    if name not in baseline['scenarios']:
+      continue
+    before = baseline['scenarios'][name]['steps_per_second']
+    after = result['steps_per_second']
+    change = after / before - 1
+    flag = ''
+    if change < -tolerance:
+      flag = '  REGRESSION'
+      regressions.append(name)
+    print(f"{name:<20}{before:>14.0f}{after:>14.0f}{change * 100:>8.1f}%{flag}")
+  return regressions
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='measure the steps per second and the real-time factor of the model')
+  parser.add_argument('--duration', type=float, default=5.0, help='model time per scenario in seconds')
+  parser.add_argument('--warm-up', type=float, default=1.0, help='model time calculated before the measurement')
+  parser.add_argument('--repeats', type=int, default=3, help='number of runs per scenario, the fastest run is reported')
+  parser.add_argument('--scenario', action='append', help='run only this scenario (can be repeated)')
+  parser.add_argument('--save', help='store the results as a json baseline')
+  parser.add_argument('--compare', nargs='?', const=BASELINE, help='compare the results with a json baseline (default benchmarks/baseline.json), exits with 1 on a regression')
+  parser.add_argument('--tolerance', type=float, default=0.1, help='allowed slowdown relative to the baseline (default 0.1 = 10%%)')
+  args = parser.parse_args()
+
+  results = run(args.duration, args.warm_up, args.scenario, args.repeats)
+
+  if args.save:
+    with open(args.save, 'w') as file:
+      json.dump(results, file, indent=2)
+
+  if args.compare:
+    with open(args.compare) as file:
+      baseline = json.load(file)
+    if compare(results, baseline, args.tolerance):
+      sys.exit(1)
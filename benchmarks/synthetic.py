@@ -0,0 +1,56 @@
+import copy
+import json
+
+def scale_definition(definition, factor):
+  # replicate every vascular bed factor times in parallel, the heart chambers (time_varying_elastances) are shared by the copies.
+  # a copy holds 1/factor of the volume and elastance and resistance are multiplied by factor, so the circulation as a whole is unchanged.
+  # the non-linear elastance el_k * (vol - u_vol)^2 is multiplied by factor as well, which takes el_k * factor^3 as the volume of a copy is 1/factor.
+  if factor == 1:
+    return copy.deepcopy(definition)
+
+  scaled = copy.deepcopy(definition)
+  scaled['name'] = f"{definition['name']}_x{factor}"
+  scaled['description'] = f"{definition['description']} with {factor} parallel copies of every vascular bed"
+
+  chambers = {c['name'] for c in definition['components'] if c['type'] == 'time_varying_elastance'}
+
+  def copy_name(name, k):
+    # the first copy keeps the original name, so the labels of the original definition stay valid
+    if name in chambers or k == 0:
+      return name
+    return f'{name}_{k}'
+
+  components = []
+  for component in definition['components']:
+    if component['type'] == 'compliance':
+      for k in range(factor):
+        c = copy.deepcopy(component)
+        c['name'] = copy_name(component['name'], k)
+        c['vol'] = component['vol'] / factor
+        c['u_vol'] = component['u_vol'] / factor
+        c['el_base'] = component['el_base'] * factor
+        if 'el_k' in component:
+          c['el_k'] = component['el_k'] * factor ** 3
+        components.append(c)
+    elif component['type'] in ('resistor', 'valve') and not (component['comp_from'] in chambers and component['comp_to'] in chambers):
+      for k in range(factor):
+        c = copy.deepcopy(component)
+        c['name'] = copy_name(component['name'], k)
+        c['comp_from'] = copy_name(component['comp_from'], k)
+        c['comp_to'] = copy_name(component['comp_to'], k)
+        c['r_for'] = component['r_for'] * factor
+        c['r_back'] = component['r_back'] * factor
+        components.append(c)
+    else:
+      # the heart chambers, the connectors between them and the exchangers are not replicated
+      components.append(copy.deepcopy(component))
+
+  scaled['components'] = components
+  return scaled
+
+def write_scaled_definition(definition_file, factor, path):
+  with open(definition_file) as file:
+    definition = json.load(file)
+  with open(path, 'w') as file:
+    json.dump(scale_definition(definition, factor), file)
+  return path
@@ -1,6 +1,18 @@
 import math
+from engine.network import NetworkProperty
 
 class Resistor:
+  # properties which are stored in the arrays of the network when the model is initialized
+  is_enabled = NetworkProperty()
+  no_flow = NetworkProperty()
+  no_backflow = NetworkProperty()
+  r_for = NetworkProperty()
+  r_back = NetworkProperty()
+  r_k1 = NetworkProperty()
+  r_k2 = NetworkProperty()
+  resistance = NetworkProperty()
+  flow = NetworkProperty()
+
   def __init__(self, model, **args):
     # initialize the super class
     super().__init__()
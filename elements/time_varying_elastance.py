@@ -1,6 +1,19 @@
 import math
+from engine.network import NetworkProperty
 
 class TimeVaryingElastance:
+  # properties which are stored in the arrays of the network when the model is initialized
+  is_enabled = NetworkProperty()
+  vol = NetworkProperty()
+  u_vol = NetworkProperty()
+  el_min = NetworkProperty()
+  el_max = NetworkProperty()
+  el_k = NetworkProperty()
+  varying_elastance_factor = NetworkProperty()
+  pres_outside = NetworkProperty()
+  recoil_pressure = NetworkProperty()
+  pres = NetworkProperty()
+
   def __init__(self, model, **args):
     # initialize the super class
     super().__init__()
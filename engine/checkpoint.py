@@ -0,0 +1,145 @@
+import json
+import numpy as np
+
+# identification and version of the checkpoint format
+CHECKPOINT_FORMAT = 'explain-checkpoint'
+CHECKPOINT_VERSION = 1
+
+# types of the model properties which are stored in a checkpoint
+STATE_TYPES = (bool, int, float, str, list, dict, type(None))
+
+def save_checkpoint(model, path):
+  network = model.network
+  io = model.io
+
+  # the dynamic state which is not stored in the network arrays
+  meta = {
+    'format': CHECKPOINT_FORMAT,
+    'version': CHECKPOINT_VERSION,
+    'name': model.name,
+    'modeling_stepsize': model.modeling_stepsize,
+    'model_clock': model.model_clock,
+    'compartments': [comp.name for comp in network.compartments],
+    'connectors': [conn.name for conn in network.connectors],
+    'models': {name: model_state(m) for name, m in model.models.items()},
+    'scheduler': scheduler_state(io.scheduler),
+    'datacollector': {
+      'sample_interval': io.dc.sample_interval,
+      'step_counter': io.dc._step_counter,
+      'watch_list': [parameter['label'] for parameter in io.dc.watch_list[2:]]
+    },
+    'integrator': integrator_state(model)
+  }
+
+  # store the network arrays and the json encoded state in a single uncompressed npz file
+  arrays = {}
+  for name, values in network.comp.items():
+    arrays['comp.' + name] = values
+  for name, values in network.conn.items():
+    arrays['conn.' + name] = values
+  arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+
+  with open(path, 'wb') as file:
+    np.savez(file, **arrays)
+
+def load_checkpoint(model, path):
+  network = model.network
+
+  with np.load(path) as checkpoint:
+    meta = json.loads(checkpoint['meta'].tobytes().decode('utf-8'))
+
+    # check whether the checkpoint belongs to this model
+    if meta.get('format') != CHECKPOINT_FORMAT:
+      raise ValueError(f'{path} is not a model checkpoint')
+    if meta['version'] > CHECKPOINT_VERSION:
+      raise ValueError(f'checkpoint version {meta["version"]} is newer than the supported version {CHECKPOINT_VERSION}')
+    if meta['compartments'] != [comp.name for comp in network.compartments] or meta['connectors'] != [conn.name for conn in network.connectors]:
+      raise ValueError(f'the topology of checkpoint {path} does not match the model')
+    if meta['modeling_stepsize'] != model.modeling_stepsize:
+      raise ValueError(f'the modeling stepsize of checkpoint {path} does not match the model')
+
+    # restore the network arrays in place, so the component views stay valid
+    for name, values in network.comp.items():
+      values[...] = checkpoint['comp.' + name]
+    for name, values in network.conn.items():
+      values[...] = checkpoint['conn.' + name]
+
+  network.update_masks()
+
+  # restore the model clock and the state of the models
+  model.model_clock = meta['model_clock']
+  for name, state in meta['models'].items():
+    if name in model.models:
+      for key, value in state.items():
+        setattr(model.models[name], key, value)
+  model.build_plan()
+
+  # restore the integrator
+  model.set_integrator(meta['integrator']['name'], **meta['integrator']['settings'])
+  factorization = meta['integrator'].get('factorization')
+  if factorization != None:
+    model.integrator.factorize(np.array(factorization['elastance']), np.array(factorization['conductance']), factorization['ticks'])
+
+  # restore the datacollector configuration
+  dc = model.io.dc
+  dc.clear_watchlist()
+  dc.set_sample_interval(meta['datacollector']['sample_interval'])
+  for label in meta['datacollector']['watch_list']:
+    prop_reference = model.io.find_model_prop(label)
+    if prop_reference != None:
+      dc.add_to_watchlist(prop_reference)
+  dc._step_counter = meta['datacollector']['step_counter']
+
+  # restore the pending property changes
+  restore_scheduler(model, meta['scheduler'])
+
+def model_state(model):
+  # store the properties of a model which hold plain values, references to other objects are rebuilt by the model
+  return {key: value for key, value in model.__dict__.items() if type(value) in STATE_TYPES and key != 'model'}
+
+def integrator_state(model):
+  integrator = model.integrator
+  if integrator == None:
+    return {'name': 'euler', 'settings': {}}
+
+  settings = {'step_ticks': integrator.step_ticks}
+  for key in ['rtol', 'atol', 'max_step_ticks', 'refactor_tolerance', 'max_update_rank']:
+    if hasattr(integrator, key):
+      settings[key] = getattr(integrator, key)
+  state = {'name': type(integrator).__name__.lower(), 'settings': settings}
+
+  # the implicit step solves with the system it factorized last, so the restored integrator factorizes the same system
+  if getattr(integrator, '_solve', None) is not None:
+    state['factorization'] = {'elastance': integrator._elastance.tolist(), 'conductance': integrator._conductance.tolist(), 'ticks': integrator._ticks}
+  return state
+
+def scheduler_state(scheduler):
+  changes = []
+  for change in scheduler.pending():
+    changes.append({
+      'label': change.prop['label'],
+      'target_value': change.target_value,
+      'initial_value': change.initial_value,
+      'start_tick': change.start_tick,
+      'end_tick': change.end_tick,
+      'running': change.running
+    })
+  # the model step of the next ramp update keeps the ramps in phase after a restore
+  next_update = scheduler._next_update if scheduler.active else None
+  return {'tick': scheduler.tick, 'next_update': next_update, 'changes': changes}
+
+def restore_scheduler(model, state):
+  scheduler = model.io.scheduler
+  scheduler.clear()
+  scheduler.tick = state['tick']
+
+  for saved in state['changes']:
+    prop_reference = model.io.find_model_prop(saved['label'])
+    if prop_reference == None:
+      print(f"{saved['label']} not found in model, scheduled change skipped")
+      continue
+    scheduler.restore(prop_reference, saved)
+
+  if state['next_update'] != None and scheduler.active:
+    scheduler._next_update = state['next_update']
+    scheduler._next_tick = min(scheduler._next_tick, scheduler._next_update)
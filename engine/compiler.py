@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+from engine.network import Network
+
+# version of the compiled definition, a new version invalidates the cache
+COMPILER_VERSION = 5
+
+# directory (next to the definition file) holding the compiled definitions
+CACHE_DIRECTORY = '.explain_cache'
+
+# required keys of the definition, the components and the models
+REQUIRED_DEFINITION_KEYS = ['name', 'description', 'weight', 'modeling_stepsize', 'components', 'models']
+REQUIRED_COMPONENT_KEYS = {
+  'compliance': ['name', 'vol', 'u_vol', 'el_base'],
+  'time_varying_elastance': ['name', 'vol', 'u_vol', 'el_min', 'el_max'],
+  'resistor': ['name', 'comp_from', 'comp_to', 'r_for', 'r_back'],
+  'valve': ['name', 'comp_from', 'comp_to', 'r_for', 'r_back'],
+  'exchanger': ['name', 'comp_blood', 'comp_gas']
+}
+# the model subtypes known to the model (see model_classes in explain.py)
+MODEL_SUBTYPES = ['ecg', 'heart', 'lungs', 'breathing', 'ans', 'metabolism', 'acidbase', 'oxygenation', 'blood', 'gas']
+
+# dependent properties which the elements always initialize themselves
+COMPARTMENT_DEFAULTS = {'pres': 0, 'recoil_pressure': 0, 'pres_outside': 0, 'varying_elastance_factor': 0}
+CONNECTOR_DEFAULTS = {'flow': 0, 'resistance': 0}
+
+
+class DefinitionError(ValueError):
+  # raised when a model definition is invalid, errors holds a dictionary (component, field, message) per problem
+  def __init__(self, errors, file_name = None):
+    self.errors = errors
+    self.file_name = file_name
+    lines = [f"{error['component']}.{error['field']}: {error['message']}" for error in errors]
+    super().__init__(f"invalid model definition {file_name or ''}\n  " + "\n  ".join(lines))
+
+
+def validate_definition(definition, file_name = None):
+  errors = []
+
+  def error(component, field, message):
+    errors.append({'component': component, 'field': field, 'message': message})
+
+  # check the definition itself
+  for key in REQUIRED_DEFINITION_KEYS:
+    if key not in definition:
+      error('definition', key, 'missing')
+  if errors:
+    raise DefinitionError(errors, file_name)
+
+  # check the components
+  names = set()
+  compartments = set()
+  for component in definition['components']:
+    name = component.get('name', '?')
+    if name in names:
+      error(name, 'name', 'duplicate component name')
+    names.add(name)
+
+    component_type = component.get('type')
+    if component_type not in REQUIRED_COMPONENT_KEYS:
+      error(name, 'type', f'unknown component type {component_type}')
+      continue
+
+    for key in REQUIRED_COMPONENT_KEYS[component_type]:
+      if key not in component:
+        error(name, key, 'missing')
+
+    if component_type in ('compliance', 'time_varying_elastance'):
+      compartments.add(name)
+
+  # check the references of the resistors and valves, the exchangers are not instantiated by the model so their gas compartments are not checked
+  for component in definition['components']:
+    name = component.get('name', '?')
+    component_type = component.get('type')
+    if component_type in ('resistor', 'valve'):
+      for key in ['comp_from', 'comp_to']:
+        if key in component and component[key] not in compartments:
+          error(name, key, f'compliance/time_varying_elastance {component[key]} not found')
+
+  # check the models
+  for model in definition['models']:
+    name = model.get('name', '?')
+    if name in names:
+      error(name, 'name', 'duplicate model name')
+    names.add(name)
+    if model.get('subtype') not in MODEL_SUBTYPES:
+      error(name, 'subtype', f"unknown model subtype {model.get('subtype')}")
+
+    # a model can be updated at a multiple of the modeling stepsize
+    if 'update_interval' in model:
+      interval = model['update_interval']
+      stepsize = definition['modeling_stepsize']
+      if not isinstance(interval, (int, float)) or isinstance(interval, bool) or interval < stepsize:
+        error(name, 'update_interval', f'must be a number of at least the modeling stepsize ({stepsize})')
+      elif abs(interval / stepsize - round(interval / stepsize)) > 1e-6:
+        error(name, 'update_interval', f'must be a multiple of the modeling stepsize ({stepsize})')
+
+  if errors:
+    raise DefinitionError(errors, file_name)
+
+
+def definition_hash(definition):
+  # hash of the content of a definition, a definition which was changed in place gets a new hash
+  return hashlib.sha256(json.dumps(definition, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def instance_attributes(component, props):
+  # the properties which are not stored in the network arrays stay in the instance dictionary of the element
+  array_names = {name for name, _, _ in props}
+  return {key: value for key, value in component.items() if key not in array_names and key != 'el_base'}
+
+
+def compile_definition(definition, file_name = None):
+  # validate the definition and resolve the connection graph once
+  validate_definition(definition, file_name)
+
+  components = definition['components']
+  tves = [c for c in components if c['type'] == 'time_varying_elastance']
+  compliances = [c for c in components if c['type'] == 'compliance']
+  valves = [c for c in components if c['type'] == 'valve']
+  resistors = [c for c in components if c['type'] == 'resistor']
+
+  # the order of the compartments and connectors is the order of the network
+  compartments = tves + compliances
+  connectors = valves + resistors
+  compartment_index = {c['name']: index for index, c in enumerate(compartments)}
+
+  comp_from, comp_to, incidence = Network.build_incidence([c['comp_from'] for c in connectors], [c['comp_to'] for c in connectors], compartment_index)
+
+  return {
+    'version': COMPILER_VERSION,
+    'definition_hash': definition_hash(definition),
+    'definition': definition,
+    'topology': {
+      'compartments': [c['name'] for c in compartments],
+      'connectors': [c['name'] for c in connectors],
+      'comp': Network.pack([{**c, **COMPARTMENT_DEFAULTS} for c in compartments], Network.compartment_props),
+      'conn': Network.pack([{**c, **CONNECTOR_DEFAULTS} for c in connectors], Network.connector_props),
+      'comp_attributes': [instance_attributes(c, Network.compartment_props) for c in compartments],
+      'conn_attributes': [instance_attributes(c, Network.connector_props) for c in connectors],
+      'comp_from': comp_from,
+      'comp_to': comp_to,
+      'incidence': incidence
+    }
+  }
+
+
+def save_compiled_definition(compiled, cache_file):
+  # the cache is plain json, the arrays of the topology are stored as lists, so loading the cache never executes code
+  topology = dict(compiled['topology'])
+  topology['comp'] = {name: values.tolist() for name, values in topology['comp'].items()}
+  topology['conn'] = {name: values.tolist() for name, values in topology['conn'].items()}
+  for key in ['comp_from', 'comp_to', 'incidence']:
+    topology[key] = topology[key].tolist()
+
+  # written to a temporary file first so parallel workers never read a partial file
+  temporary_file = f'{cache_file}.{os.getpid()}.tmp'
+  with open(temporary_file, 'w') as file:
+    json.dump({**compiled, 'topology': topology}, file)
+  os.replace(temporary_file, cache_file)
+
+
+def read_compiled_definition(cache_file):
+  with open(cache_file, 'r') as file:
+    compiled = json.load(file)
+
+  # restore the arrays with the dtypes of the network
+  topology = compiled['topology']
+  topology['comp'] = {name: np.array(topology['comp'][name], dtype=dtype) for name, _, dtype in Network.compartment_props}
+  topology['conn'] = {name: np.array(topology['conn'][name], dtype=dtype) for name, _, dtype in Network.connector_props}
+  topology['comp_from'] = np.array(topology['comp_from'], dtype=int)
+  topology['comp_to'] = np.array(topology['comp_to'], dtype=int)
+  topology['incidence'] = np.array(topology['incidence'], dtype=float).reshape(len(topology['connectors']), len(topology['compartments']))
+  return compiled
+
+
+def load_compiled_definition(file_name, use_cache = True):
+  # read the definition file, the content hash is the key of the cache
+  with open(file_name, 'rb') as file:
+    content = file.read()
+  key = hashlib.sha256(content).hexdigest()
+  cache_file = os.path.join(os.path.dirname(os.path.abspath(file_name)), CACHE_DIRECTORY, f'{key}.v{COMPILER_VERSION}.json')
+
+  # load the compiled definition from the cache, a damaged file is compiled again
+  if use_cache and os.path.exists(cache_file):
+    try:
+      compiled = read_compiled_definition(cache_file)
+      if compiled.get('version') == COMPILER_VERSION:
+        return compiled
+    except (OSError, ValueError, KeyError, TypeError):
+      pass
+
+  # parse and compile the definition
+  compiled = compile_definition(json.loads(content), file_name)
+
+  # store the compiled definition
+  if use_cache:
+    try:
+      os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+      save_compiled_definition(compiled, cache_file)
+    except OSError:
+      pass
+
+  return compiled
@@ -0,0 +1,278 @@
+import math
+from time import perf_counter
+import numpy as np
+
+class Ensemble:
+  # the ecg and heart properties which can differ between the variants
+  ecg_props = ['heart_rate', 'pq_time', 'qrs_time', 'qt_time']
+  heart_props = ['a']
+
+  def __init__(self, template, variants):
+    # the template model provides the topology and the initial state of the variants
+    self.template = template
+
+    # get the modeling stepsize from the template model
+    self.modeling_stepsize = self.template.modeling_stepsize
+    self._t = self.modeling_stepsize
+
+    # every variant is a dictionary with property overrides, e.g. {'LV.el_max': 14000, 'ecg.heart_rate': 140}
+    self.variants = variants
+    self.no_variants = len(variants)
+
+    # define a variable holding the current model clock
+    self.model_clock = 0
+
+    # define some performance properties
+    self.step_duration = 0
+    self.run_duration = 0
+
+    # hold the state of all variants as rows of the compartment and connector state matrices
+    self.network = self.template.network.replicate(self.no_variants)
+
+    # initialize the ecg and heart state of all variants
+    self.initialize_ecg()
+    self.initialize_heart()
+
+    # apply the per variant property overrides
+    for index, overrides in enumerate(variants):
+      for prop, value in overrides.items():
+        self.set_value(prop, value, index)
+
+    # the masks depend on the overridden switches
+    self.network.update_masks()
+
+    # define the watch list and the per variant data
+    self.watch_list = []
+    self.sample_interval = 0.005
+    self.clear_data()
+
+  def initialize_ecg(self):
+    ecg = self.template.models['ecg']
+    n = self.no_variants
+    self.ecg_enabled = ecg.is_enabled
+
+    # per variant copies of the ecg properties and state
+    self.ecg = {}
+    for prop in self.ecg_props + ['cqt_time', 'measured_heart_rate']:
+      self.ecg[prop] = np.full(n, float(getattr(ecg, prop)))
+    for prop in ['ncc_atrial', 'ncc_ventricular', '_measured_qrs_counter']:
+      self.ecg[prop] = np.full(n, getattr(ecg, prop), dtype=int)
+    for prop in ['_sa_node_counter', '_pq_time_counter', '_qrs_time_counter', '_qt_time_counter', '_measured_hr_time_counter']:
+      self.ecg[prop] = np.full(n, float(getattr(ecg, prop)))
+    for prop in ['_pq_running', '_qrs_running', '_qt_running', '_ventricle_is_refractory']:
+      self.ecg[prop] = np.full(n, getattr(ecg, prop), dtype=bool)
+
+  def initialize_heart(self):
+    heart = self.template.models['heart']
+    n = self.no_variants
+    self.heart_enabled = heart.is_enabled
+
+    # per variant copies of the heart properties and state
+    self.heart = {'a': np.full(n, float(heart.a)), 'aaf': np.zeros(n), 'vaf': np.zeros(n)}
+
+    # store the positions of the heart chambers in the compartment arrays
+    index = self.network.compartment_index
+    self._atria = [index['RA'], index['LA']]
+    self._ventricles = [index['RV'], index['LV']]
+
+  def find_prop(self, prop):
+    # split the component or model from the property and return the array holding the values of all variants
+    t = prop.split(sep=".")
+    if len(t) == 2:
+      name, prop_name = t
+      if name in self.network.compartment_index:
+        if prop_name == 'el_base':
+          prop_name = 'el_min'
+        if prop_name in self.network.comp:
+          return self.network.comp[prop_name][:, self.network.compartment_index[name]]
+      if name in self.network.connector_index:
+        if prop_name in self.network.conn:
+          return self.network.conn[prop_name][:, self.network.connector_index[name]]
+      if name == 'ecg' and prop_name in self.ecg:
+        return self.ecg[prop_name]
+      if name == 'heart' and prop_name in self.heart:
+        return self.heart[prop_name]
+
+    return None
+
+  def get_value(self, prop):
+    # return the current values of a property for all variants
+    values = self.find_prop(prop)
+    if values is None:
+      print(f"{prop} not found in ensemble")
+      return None
+    return values.copy()
+
+  def set_value(self, prop, value, variant = None):
+    # the values of a component property are a column of the state matrix, so write through the view
+    values = self.find_prop(prop)
+    if values is None:
+      print(f"{prop} not found in ensemble")
+      return
+
+    if variant is None:
+      values[:] = value
+    else:
+      values[variant] = value
+
+    # the masks depend on the switches of the components
+    if prop.split(sep=".")[-1] in self.network.mask_props:
+      self.network.update_masks()
+
+  def clear_data(self):
+    # the samples are taken at the same model steps as the datacollector of a model takes them
+    self._step_counter = 0
+    self.collected_data = {'time': []}
+    for label in self.watch_list:
+      self.collected_data[label] = []
+
+  def clear_watchlist(self):
+    self.watch_list = []
+    self.clear_data()
+
+  def set_sample_interval(self, new_interval):
+    self.sample_interval = new_interval
+
+  def add_to_watchlist(self, properties):
+    if isinstance(properties, str):
+      properties = [properties]
+
+    for prop in properties:
+      if self.find_prop(prop) is not None:
+        self.watch_list.append(prop)
+      else:
+        print(f"{prop} not found in ensemble")
+
+    # first clear all data
+    self.clear_data()
+
+  def collect_data(self):
+    self.collected_data['time'].append(self.model_clock)
+    for label in self.watch_list:
+      self.collected_data[label].append(self.find_prop(label).copy())
+
+  def get_data(self, label):
+    # return the samples of a watched property as an array with a column per variant
+    if label == 'time':
+      return np.array(self.collected_data['time'])
+    return np.array(self.collected_data[label]).reshape(-1, self.no_variants)
+
+  def get_variant_data(self, variant):
+    # return the collected data of one variant as a dictionary of arrays
+    data = {'time': self.get_data('time')}
+    for label in self.watch_list:
+      data[label] = self.get_data(label)[:, variant]
+    return data
+
+  def calculate(self, time_to_calculate):
+    # calculate the number of steps needed (= time in seconds / modeling stepsize in seconds)
+    no_steps = int(time_to_calculate / self.modeling_stepsize)
+
+    # sample the watched properties every sample_steps model steps
+    sample_steps = max(int(round(self.sample_interval / self.modeling_stepsize)), 1)
+
+    perf_start = perf_counter()
+
+    for _ in range(no_steps):
+      # advance the circulation of all variants at once
+      self.network.step()
+
+      # drive the heart of all variants
+      if self.ecg_enabled:
+        self.ecg_step()
+      if self.heart_enabled:
+        self.heart_step()
+
+      # collect the data of all variants
+      if self._step_counter >= sample_steps:
+        self._step_counter = 0
+        self.collect_data()
+      self._step_counter += 1
+
+      # increase the model clock
+      self.model_clock += self.modeling_stepsize
+
+    perf_stop = perf_counter()
+
+    # store the performance metrics
+    self.run_duration = perf_stop - perf_start
+    self.step_duration = (self.run_duration / max(no_steps, 1)) * 1000
+
+  def ecg_step(self):
+    # vectorized version of Ecg.model_cycle over all variants
+    e = self.ecg
+
+    # calculate the correct qt time
+    heart_rate = np.maximum(e['heart_rate'], 10)
+    e['cqt_time'][:] = e['qt_time'] * np.sqrt(60.0 / heart_rate) - e['qrs_time']
+
+    # calculate the sa_node_time in seconds depending on the heart_rate
+    sa_node_period = np.where(e['heart_rate'] > 0, 60 / np.where(e['heart_rate'] > 0, e['heart_rate'], 1), 60)
+
+    # has the sa node period elapsed?
+    sa_fired = e['_sa_node_counter'] > sa_node_period
+    e['_sa_node_counter'][sa_fired] = 0
+    e['_pq_running'][sa_fired] = True
+    e['ncc_atrial'][sa_fired] = -1
+
+    # has the pq time elapsed?
+    pq_elapsed = e['_pq_time_counter'] > e['pq_time']
+    e['_pq_time_counter'][pq_elapsed] = 0
+    e['_pq_running'][pq_elapsed] = False
+    qrs_started = pq_elapsed & ~e['_ventricle_is_refractory']
+    e['_qrs_running'][qrs_started] = True
+    e['ncc_ventricular'][qrs_started] = -1
+    e['_measured_qrs_counter'][qrs_started] += 1
+
+    # has the qrs time elapsed?
+    qrs_elapsed = e['_qrs_time_counter'] > e['qrs_time']
+    e['_qrs_time_counter'][qrs_elapsed] = 0
+    e['_qrs_running'][qrs_elapsed] = False
+    e['_qt_running'][qrs_elapsed] = True
+    e['_ventricle_is_refractory'][qrs_elapsed] = True
+
+    # has the qt time elapsed?
+    qt_elapsed = e['_qt_time_counter'] > e['cqt_time']
+    e['_qt_time_counter'][qt_elapsed] = 0
+    e['_qt_running'][qt_elapsed] = False
+    e['_ventricle_is_refractory'][qt_elapsed] = False
+
+    # increase the ecg timers
+    e['_sa_node_counter'] += self._t
+    e['_pq_time_counter'] += self._t * e['_pq_running']
+    e['_qrs_time_counter'] += self._t * e['_qrs_running']
+    e['_qt_time_counter'] += self._t * e['_qt_running']
+
+    # calculate the measured heart_rate based on the ventricular rate every 5 seconds
+    measured = e['_measured_hr_time_counter'] > 5
+    if measured.any():
+      e['measured_heart_rate'][measured] = 60.0 / (e['_measured_hr_time_counter'][measured] / np.maximum(e['_measured_qrs_counter'][measured], 1))
+      e['_measured_qrs_counter'][measured] = 0
+      e['_measured_hr_time_counter'][measured] = 0
+    e['_measured_hr_time_counter'] += self._t
+
+    # increase the contraction timers
+    e['ncc_atrial'] += 1
+    e['ncc_ventricular'] += 1
+
+  def heart_step(self):
+    # vectorized version of Heart.model_cycle over all variants
+    e = self.ecg
+    h = self.heart
+
+    atrial_duration = e['pq_time']
+    ventricular_duration = e['cqt_time'] + e['qrs_time']
+
+    # varying elastance activation function of the atria and the ventricles
+    h['aaf'][:] = self.activation(e['ncc_atrial'], atrial_duration, h['a'])
+    h['vaf'][:] = self.activation(e['ncc_ventricular'], ventricular_duration, h['a'])
+
+    # transfer the activation function to the heart compartments
+    factor = self.network.comp['varying_elastance_factor']
+    factor[:, self._atria] = h['aaf'][:, None]
+    factor[:, self._ventricles] = h['vaf'][:, None]
+
+  def activation(self, ncc, duration, a):
+    phase = (ncc * self._t * math.pi) / duration
+    active = (ncc >= 0) & (ncc < duration / self._t)
+    return np.where(active, np.sin(phase - np.sin(phase) / a), 0.0)
@@ -0,0 +1,410 @@
+from time import perf_counter
+import numpy as np
+
+# the sparse lu factorization of scipy is used when scipy is installed, otherwise the implicit integrator falls back to dense matrices
+try:
+  from scipy.sparse import csc_matrix
+  from scipy.sparse.linalg import splu
+except ImportError:
+  csc_matrix = None
+
+class IntegrationError(RuntimeError):
+  # raised when the compartment volumes are no longer finite, the integration step is too large for the model
+  def __init__(self, integrator, model_clock, ticks):
+    self.integrator = integrator
+    self.model_clock = model_clock
+    self.ticks = ticks
+    step = ticks * integrator._t
+    super().__init__(f'{type(integrator).__name__} integration diverged at {round(model_clock, 5)} sec. with a step of {ticks} model steps ({round(step, 6)} sec.), use a smaller step_ticks')
+
+
+class Integrator:
+  # explicit runge-kutta integrator of the compartment volumes, defined by its butcher tableau
+  # the models (ecg, heart, ...) keep running at the modeling stepsize, so the stage times are rounded to model steps
+  c = []
+  a = []
+  b = []
+  # weights of the embedded lower order solution (None when there's no error estimate)
+  b_low = None
+  # the last stage is evaluated at the new state (first same as last)
+  fsal = False
+
+  def __init__(self, model, step_ticks = 1, **args):
+    # store a reference to the model
+    self.model = model
+    self.network = model.network
+
+    # get the modeling stepsize from the model
+    self._t = model.modeling_stepsize
+
+    # the integration step expressed in model steps
+    self.step_ticks = max(int(step_ticks), 1)
+
+    # set the independent properties
+    for key, value in args.items():
+      setattr(self, key, value)
+
+    # define some performance properties
+    self.no_evaluations = 0
+    self.no_accepted = 0
+    self.no_rejected = 0
+
+  def derivative(self, vol):
+    # calculate the pressures and flows belonging to the volumes and return the volume change per second
+    comp = self.network.comp
+    comp['vol'][...] = vol
+    self.network.calculate_pressures(comp)
+    self.network.calculate_flows(comp, self.network.conn)
+    self.no_evaluations += 1
+    return self.network.volume_change(comp, self.network.conn, 1.0)
+
+  def calculate(self, time_to_calculate):
+    # calculate the number of model steps needed (= time in seconds / modeling stepsize in seconds)
+    no_steps = int(time_to_calculate / self._t)
+
+    # find the watched properties of the datacollector and the trend collector which are stored in the network, these are interpolated between the integration steps
+    io = self.model.io
+    self._network_watch = {}
+    for collector in (io.dc, io.trends):
+      if collector != None:
+        self._network_watch[id(collector)] = ([index for index, p in enumerate(collector.watch_list) if self.in_network(p)], [p for p in collector.watch_list if self.in_network(p)])
+
+    # make sure the datacollector can hold the samples of this run
+    io.dc.reserve(no_steps)
+
+    perf_start = perf_counter()
+
+    # evaluate the first stage at the current state
+    vol = self.network.comp['vol'].copy()
+    k1 = self.derivative(vol)
+
+    ticks_done = 0
+    while ticks_done < no_steps:
+      ticks = min(self.step_ticks, no_steps - ticks_done)
+      start_values = self.read_network_watch()
+      vol, k1, ticks = self.step(vol, k1, ticks)
+      ticks_done += ticks
+
+      # a step which is too large for the stiffness of the model makes the volumes blow up
+      if not np.isfinite(vol).all():
+        raise IntegrationError(self, self.model.model_clock, ticks)
+
+      # hand the samples of this integration step to the datacollector
+      self.store_samples(start_values, ticks)
+
+      # process the property changes for the passed model steps
+      for _ in range(ticks):
+        self.model.io.update_prop_changes()
+
+    perf_stop = perf_counter()
+
+    # store the performance metrics
+    self.model.run_duration = perf_stop - perf_start
+    self.model.step_duration = (self.model.run_duration / max(no_steps, 1)) * 1000
+
+  def step(self, vol, k1, ticks):
+    # take an integration step of a fixed number of model steps
+    self._pending_samples = []
+    vol_new, stages = self.attempt(vol, k1, ticks)
+    self.no_accepted += 1
+    return vol_new, self.next_stage(vol_new, stages), ticks
+
+  def attempt(self, vol, k1, ticks):
+    h = ticks * self._t
+    stages = [k1]
+    advanced = 0
+
+    for i in range(1, len(self.c)):
+      # advance the models to the time of this stage
+      target = int(round(self.c[i] * ticks))
+      self.advance_models(target - advanced)
+      advanced = target
+
+      # evaluate the stage
+      vol_stage = vol + h * sum(a_ij * k_j for a_ij, k_j in zip(self.a[i], stages) if a_ij != 0)
+      stages.append(self.derivative(vol_stage))
+
+    # advance the models to the end of the step
+    self.advance_models(ticks - advanced)
+
+    # calculate the new volumes
+    vol_new = vol + h * sum(b_j * k_j for b_j, k_j in zip(self.b, stages) if b_j != 0)
+
+    return vol_new, stages
+
+  def next_stage(self, vol_new, stages):
+    # the first stage of the next step is the derivative at the new state, which also sets the pressures and flows of the new state
+    if self.fsal:
+      return stages[-1]
+    return self.derivative(vol_new)
+
+  def advance_models(self, ticks):
+    io = self.model.io
+    for _ in range(ticks):
+      # calculate the influence of the enabled models on the elements
+      for model_step in self.model.plan:
+        model_step()
+
+      # read the model properties at the sample times, the network properties are interpolated later
+      io.collect_data(self.model.model_clock, self._pending_samples)
+
+      # increase the model clock
+      self.model.model_clock += self._t
+
+  def in_network(self, parameter):
+    # check whether the watched property is stored in the arrays of the network
+    return 'array' in parameter
+
+  def read_network_watch(self):
+    return {key: [p['get']() for p in watch] for key, (_, watch) in self._network_watch.items()}
+
+  def store_samples(self, start_values, ticks):
+    # interpolate the network properties linearly between the start and the end of the integration step
+    if len(self._pending_samples) == 0:
+      return
+    end_values = self.read_network_watch()
+    clock_start = self.model.model_clock - ticks * self._t
+    for collector, model_clock, values in self._pending_samples:
+      key = id(collector)
+      fraction = (model_clock + self._t - clock_start) / (ticks * self._t)
+      for column, start, end in zip(self._network_watch[key][0], start_values[key], end_values[key]):
+        values[column] = start + fraction * (end - start)
+      collector.store_sample(model_clock, values)
+
+
+class RK4(Integrator):
+  # classic fourth order runge-kutta with a fixed step
+  c = [0, 1 / 2, 1 / 2, 1]
+  a = [[], [1 / 2], [0, 1 / 2], [0, 0, 1]]
+  b = [1 / 6, 1 / 3, 1 / 3, 1 / 6]
+
+
+class RK45(Integrator):
+  # dormand-prince 5(4) pair with error control on the compartment volumes
+  c = [0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1]
+  a = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]
+  ]
+  b = [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0]
+  b_low = [5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40]
+  fsal = True
+
+  def __init__(self, model, step_ticks = 1, rtol = 1e-6, atol = 1e-9, max_step_ticks = 100, **args):
+    super().__init__(model, step_ticks, **args)
+
+    # error tolerances on the compartment volumes (relative and absolute in liters)
+    self.rtol = rtol
+    self.atol = atol
+
+    # the largest integration step expressed in model steps
+    self.max_step_ticks = max_step_ticks
+
+  def step(self, vol, k1, ticks):
+    while True:
+      # store the state of the models so a rejected step can be undone
+      snapshot = self.save_models()
+      self._pending_samples = []
+
+      vol_new, stages = self.attempt(vol, k1, ticks)
+
+      # estimate the error from the difference between the fifth and fourth order solutions
+      h = ticks * self._t
+      error = h * sum((b - b_low) * k for b, b_low, k in zip(self.b, self.b_low, stages) if b != b_low)
+      scale = self.atol + self.rtol * np.maximum(np.abs(vol), np.abs(vol_new))
+      error_norm = float(np.max(np.abs(error) / scale))
+
+      # change the step size, a safety factor keeps the next step within the tolerance
+      factor = 5.0 if error_norm == 0 else min(max(0.9 * error_norm ** -0.2, 0.2), 5.0)
+      next_ticks = min(max(int(ticks * factor), 1), self.max_step_ticks)
+
+      if error_norm <= 1 or ticks == 1:
+        self.no_accepted += 1
+        self.step_ticks = next_ticks
+        return vol_new, self.next_stage(vol_new, stages), ticks
+
+      # reject the step, restore the models and try again with a smaller step
+      self.no_rejected += 1
+      self.restore_models(snapshot)
+      ticks = min(next_ticks, ticks - 1)
+
+  def save_models(self):
+    return {
+      'models': [dict(model.__dict__) for model in self.model.models.values()],
+      'varying_elastance_factor': self.network.comp['varying_elastance_factor'].copy(),
+      'step_counter': self.model.io.dc._step_counter,
+      'trends_step_counter': self.model.io.trends._step_counter if self.model.io.trends != None else None,
+      'model_clock': self.model.model_clock
+    }
+
+  def restore_models(self, snapshot):
+    for model, state in zip(self.model.models.values(), snapshot['models']):
+      model.__dict__.clear()
+      model.__dict__.update(state)
+    self.network.comp['varying_elastance_factor'][...] = snapshot['varying_elastance_factor']
+    self.model.io.dc._step_counter = snapshot['step_counter']
+    if self.model.io.trends != None:
+      self.model.io.trends._step_counter = snapshot['trends_step_counter']
+    self.model.model_clock = snapshot['model_clock']
+
+
+class Implicit(Integrator):
+  # linearly implicit euler step: (I - h J) dvol = h f(vol), with the jacobian J = -L D of the connection graph
+  # L is the laplacian of the graph weighted with the connector conductances and D holds the compartment elastances (dP/dV)
+  # the changes of the elastances (heart chambers) and conductances (valves) since the last factorization are solved as a low rank update,
+  # the system is only factorized again when too many of them changed materially
+
+  # networks with more compartments are factorized as sparse matrices (when scipy is installed)
+  sparse_threshold = 200
+
+  def __init__(self, model, step_ticks = 10, refactor_tolerance = 0.001, max_update_rank = 16, **args):
+    super().__init__(model, step_ticks, **args)
+
+    # relative change of an elastance or a conductance which is taken into account (smaller changes are ignored)
+    self.refactor_tolerance = refactor_tolerance
+
+    # largest number of changed compartment columns solved as a low rank update before the system is factorized again
+    self.max_update_rank = max_update_rank
+
+    # the entries of the laplacian, every connector couples its two compartments
+    network = self.network
+    self.no_compartments = len(network.compartments)
+    self._rows = np.concatenate([network.comp_from, network.comp_to, network.comp_from, network.comp_to])
+    self._cols = np.concatenate([network.comp_from, network.comp_to, network.comp_to, network.comp_from])
+    self._signs = np.repeat([1.0, 1.0, -1.0, -1.0], len(network.connectors))
+    self._entry_connectors = np.tile(np.arange(len(network.connectors)), 4)
+    self._selections = {}
+
+    # the state for which the system was factorized
+    self._solve = None
+    self._elastance = None
+    self._conductance = None
+    self._ticks = None
+    self.no_factorizations = 0
+
+  def step(self, vol, k1, ticks):
+    self._pending_samples = []
+    h = ticks * self._t
+
+    # advance the models to the end of the step, the elastances of the heart chambers are taken at the new time
+    self.advance_models(ticks)
+
+    # the volume change at the current volumes and the linearization of the system around them
+    f = self.derivative(vol)
+    elastance, conductance = self.linearization(vol)
+    if self._solve is None or ticks != self._ticks:
+      self.factorize(elastance, conductance, ticks)
+
+    # solve for the volume change of the step, like the euler step the pressures and flows belong to the volumes at the start of the step
+    vol_new = vol + self.solve(elastance, conductance, h * f)
+    self.network.comp['vol'][...] = vol_new
+    self.no_accepted += 1
+
+    return vol_new, None, ticks
+
+  def linearization(self, vol):
+    network = self.network
+    comp = network.comp
+    conn = network.conn
+
+    # the volume derivative of the pressure, P = (V - U) * (E + el_k * (V - U)^2) so dP/dV = E + 3 * el_k * (V - U)^2
+    vol_above_unstressed = vol - comp['u_vol']
+    elastance = (comp['el_max'] - comp['el_min']) * comp['varying_elastance_factor'] + comp['el_min']
+    elastance += 3 * comp['el_k'] * vol_above_unstressed * vol_above_unstressed
+
+    # the conductance of the connectors which carry flow, a closed valve (blocked backflow) doesn't couple its compartments
+    conductance = np.where(network.conn_open, 1.0 / np.where(conn['resistance'] != 0, conn['resistance'], np.inf), 0.0)
+    if network.any_no_backflow:
+      pressure_difference = comp['pres'][network.comp_from] - comp['pres'][network.comp_to]
+      conductance[network.conn_no_backflow & (pressure_difference < 0)] = 0.0
+
+    return elastance, conductance
+
+  def update_columns(self, elastance, conductance, h, columns):
+    # the changed columns of h * L * D since the factorization, the rows of the disabled compartments stay empty as their volumes don't change
+    key = columns.tobytes()
+    selection = self._selections.get(key)
+    if selection is None:
+      # the entries of the laplacian which lie in the changed columns, the same compartments tend to change step after step
+      position = np.full(self.no_compartments, -1)
+      position[columns] = np.arange(len(columns))
+      selected = np.flatnonzero(position[self._cols] >= 0)
+      selection = (self._rows[selected] * len(columns) + position[self._cols[selected]], self._rows[selected], self._cols[selected], self._entry_connectors[selected], self._signs[selected])
+      if len(self._selections) > 64:
+        self._selections.clear()
+      self._selections[key] = selection
+
+    index, rows, cols, connectors, signs = selection
+    values = h * signs * self.network.comp['is_enabled'][rows] * (conductance[connectors] * elastance[cols] - self._conductance[connectors] * self._elastance[cols])
+    return np.bincount(index, values, self.no_compartments * len(columns)).reshape(self.no_compartments, len(columns))
+
+  def factorize(self, elastance, conductance, ticks):
+    network = self.network
+    h = ticks * self._t
+    n = self.no_compartments
+
+    # entries of h * L * D, the rows of the disabled compartments stay empty as their volumes don't change
+    values = h * self._signs * conductance[self._entry_connectors] * elastance[self._cols] * network.comp['is_enabled'][self._rows]
+
+    # the matrix of the system is I + h * L * D
+    rows = np.concatenate([self._rows, np.arange(n)])
+    cols = np.concatenate([self._cols, np.arange(n)])
+    values = np.concatenate([values, np.ones(n)])
+
+    if csc_matrix is not None and n > self.sparse_threshold:
+      # the matrix is strictly diagonally dominant by columns, so the symmetric ordering of the graph is kept without pivoting
+      self._solve = splu(csc_matrix((values, (rows, cols)), shape=(n, n)), permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0).solve
+    else:
+      matrix = np.zeros((n, n))
+      np.add.at(matrix, (rows, cols), values)
+      self._solve = np.linalg.inv(matrix).dot
+
+    self._elastance = elastance
+    self._conductance = conductance
+    self._ticks = ticks
+    self.no_factorizations += 1
+
+  def solve(self, elastance, conductance, rhs):
+    # the compartments whose elastance changed materially and the compartments of the connectors whose conductance changed materially
+    tolerance = self.refactor_tolerance
+    changed_elastance = np.abs(elastance - self._elastance) > tolerance * np.abs(self._elastance)
+    changed_conductance = np.abs(conductance - self._conductance) > tolerance * np.abs(self._conductance)
+    changed = changed_elastance.copy()
+    changed[self.network.comp_from[changed_conductance]] = True
+    changed[self.network.comp_to[changed_conductance]] = True
+    columns = np.flatnonzero(changed)
+
+    if len(columns) == 0:
+      return self._solve(rhs)
+
+    if len(columns) > self.max_update_rank:
+      # too many changes for a low rank update
+      self.factorize(elastance, conductance, self._ticks)
+      return self._solve(rhs)
+
+    # the new matrix differs from the factorized matrix in the changed columns only: M' = M + U C^T (woodbury identity)
+    h = self._ticks * self._t
+    # the changes below the tolerance are ignored
+    new_elastance = np.where(changed_elastance, elastance, self._elastance)
+    new_conductance = np.where(changed_conductance, conductance, self._conductance)
+    update = self.update_columns(new_elastance, new_conductance, h, columns)
+
+    # solve for the right hand side and the update columns at once
+    solution = self._solve(np.column_stack([rhs, update]))
+    y = solution[:, 0]
+    z = solution[:, 1:]
+    capacitance = np.eye(len(columns)) + z[columns]
+    return y - z @ np.linalg.solve(capacitance, y[columns])
+
+
+# the available integrators by name
+integrators = {
+  'rk4': RK4,
+  'rk45': RK45,
+  'implicit': Implicit
+}
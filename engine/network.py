@@ -0,0 +1,245 @@
+import copy
+import numpy as np
+
+class NetworkProperty:
+  # descriptor which stores a component property in the arrays of the network once the component is bound to it
+  def __init__(self, array_name = None):
+    # name of the array in the network (defaults to the name of the property)
+    self.array_name = array_name
+
+  def __set_name__(self, owner, name):
+    # store the name of the property
+    self.name = name
+    if self.array_name is None:
+      self.array_name = name
+
+  def __get__(self, obj, objtype = None):
+    if obj is None:
+      return self
+
+    # if the component is not bound to a network the property lives in the instance dictionary
+    arrays = obj.__dict__.get('_network_arrays')
+    if arrays is None:
+      try:
+        return obj.__dict__[self.name]
+      except KeyError:
+        raise AttributeError(self.name)
+
+    # return the value as a python scalar so type checks in the interface keep working
+    return arrays[self.array_name][obj.__dict__['_network_index']].item()
+
+  def __set__(self, obj, value):
+    arrays = obj.__dict__.get('_network_arrays')
+    if arrays is None:
+      obj.__dict__[self.name] = value
+    else:
+      arrays[self.array_name][obj.__dict__['_network_index']] = value
+      # the masks of the network depend on the switches of the components
+      if self.array_name in Network.mask_props:
+        obj.__dict__['_network'].update_masks()
+
+
+class Network:
+  # properties of the compliances and time_varying_elastances which are stored in the compartment arrays (array name, default value, dtype)
+  compartment_props = [
+    ('is_enabled', True, bool),
+    ('vol', 0.0, float),
+    ('u_vol', 0.0, float),
+    ('el_min', 0.0, float),
+    ('el_max', 0.0, float),
+    ('el_k', 0.0, float),
+    ('varying_elastance_factor', 0.0, float),
+    ('pres_outside', 0.0, float),
+    ('recoil_pressure', 0.0, float),
+    ('pres', 0.0, float)
+  ]
+
+  # properties of the valves and resistors which are stored in the connector arrays (array name, default value, dtype)
+  connector_props = [
+    ('is_enabled', True, bool),
+    ('no_flow', False, bool),
+    ('no_backflow', False, bool),
+    ('r_for', 0.0, float),
+    ('r_back', 0.0, float),
+    ('r_k1', 0.0, float),
+    ('r_k2', 0.0, float),
+    ('resistance', 0.0, float),
+    ('flow', 0.0, float)
+  ]
+
+  # properties which determine the masks of the network
+  mask_props = ('is_enabled', 'no_flow', 'no_backflow', 'r_k1', 'r_k2')
+
+  def __init__(self, model, topology):
+    # store a reference to the model
+    self.model = model
+
+    # get the modeling stepsize from the model
+    self.t = model.modeling_stepsize
+
+    # collect the compartments (time_varying_elastances first, then the compliances) and the connectors (valves first, then the resistors)
+    self.compartments = list(model.time_varying_elastances.values()) + list(model.compliances.values())
+    self.connectors = list(model.valves.values()) + list(model.resistors.values())
+
+    # store the position of every compartment in the compartment arrays
+    self.compartment_index = {}
+    for index, comp in enumerate(self.compartments):
+      self.compartment_index[comp.name] = index
+
+    # store the position of every connector in the connector arrays
+    self.connector_index = {}
+    for index, conn in enumerate(self.connectors):
+      self.connector_index[conn.name] = index
+
+    # the elements are built from the compiled topology, so they are in the order of its arrays
+    if topology['compartments'] != list(self.compartment_index) or topology['connectors'] != list(self.connector_index):
+      raise ValueError('the elements of the model do not match the compiled topology')
+
+    # use the arrays and the incidence structure of the compiled definition
+    self.comp = {name: values.copy() for name, values in topology['comp'].items()}
+    self.conn = {name: values.copy() for name, values in topology['conn'].items()}
+    self.comp_from = topology['comp_from'].copy()
+    self.comp_to = topology['comp_to'].copy()
+    self.incidence = topology['incidence'].copy()
+
+    # from now on the properties of the components are views into the arrays
+    self.bind(self.compartments, self.comp)
+    self.bind(self.connectors, self.conn)
+
+    # determine which compartments and connectors take part in the calculations
+    self.update_masks()
+
+  @classmethod
+  def pack(cls, sources, props):
+    # pack the values of the source dictionaries (instance dictionaries or definition entries) into arrays
+    arrays = {}
+    for name, default, dtype in props:
+      arrays[name] = np.array([cls.initial_value(source, name, default) for source in sources], dtype=dtype)
+    return arrays
+
+  @staticmethod
+  def initial_value(source, name, default):
+    # the elastance of a compliance is stored in the el_min array and the el_max array is not used
+    if name == 'el_min' and 'el_base' in source:
+      return source['el_base']
+    return source.get(name, default)
+
+  @staticmethod
+  def build_incidence(comp_from_names, comp_to_names, compartment_index):
+    no_connectors = len(comp_from_names)
+
+    # indices of the compartments each connector connects (-1 when the compartment is not found)
+    comp_from = np.array([compartment_index.get(name, -1) for name in comp_from_names], dtype=int)
+    comp_to = np.array([compartment_index.get(name, -1) for name in comp_to_names], dtype=int)
+
+    # the incidence matrix translates the connector volume changes to the compartment volume changes
+    incidence = np.zeros((no_connectors, len(compartment_index)))
+    for index in range(no_connectors):
+      # a connector which misses a compartment can never carry flow
+      if comp_from[index] < 0 or comp_to[index] < 0:
+        continue
+      # positive flows remove volume from comp_from and add volume to comp_to
+      incidence[index, comp_from[index]] -= 1
+      incidence[index, comp_to[index]] += 1
+
+    return comp_from, comp_to, incidence
+
+  def bind(self, components, arrays):
+    for index, component in enumerate(components):
+      # remove the values from the instance dictionary as they now live in the arrays
+      for name in arrays:
+        component.__dict__.pop(name, None)
+      component.__dict__.pop('el_base', None)
+      # bind the component to the arrays
+      component.__dict__['_network'] = self
+      component.__dict__['_network_index'] = index
+      component.__dict__['_network_arrays'] = arrays
+
+  def update_masks(self):
+    # the masks are rebuilt only when a switch changes, so the step doesn't have to check every component
+    self.all_compartments_enabled = bool(np.all(self.comp['is_enabled']))
+    # a connector is open when it is enabled and the no_flow flag is not set
+    self.conn_open = self.conn['is_enabled'] & ~self.conn['no_flow']
+    self.conn_closed = ~self.conn_open
+    self.all_connectors_open = bool(np.all(self.conn_open))
+    # only the open connectors with the no_backflow flag set have to be checked for backflow
+    self.conn_no_backflow = self.conn_open & self.conn['no_backflow']
+    self.any_no_backflow = bool(np.any(self.conn_no_backflow))
+    # the flow dependent parts of the resistance are only calculated when they are used
+    self.nonlinear_resistance = bool(np.any(self.conn['r_k1']) or np.any(self.conn['r_k2']))
+
+  def step(self):
+    # calculate the pressures and flows and update the volumes
+    self.calculate_pressures(self.comp)
+    self.calculate_flows(self.comp, self.conn)
+    self.comp['vol'] += self.volume_change(self.comp, self.conn, self.t)
+
+  def calculate_pressures(self, comp):
+    # calculate the volume above the unstressed volume
+    vol_above_unstressed = comp['vol'] - comp['u_vol']
+
+    # calculate the elastance, which is volume dependent in a non-linear way and dependent on the varying elastance factor
+    elastance = comp['el_max'] - comp['el_min']
+    elastance *= comp['varying_elastance_factor']
+    elastance += comp['el_min']
+    elastance += comp['el_k'] * vol_above_unstressed * vol_above_unstressed
+
+    # calculate the recoil pressure and the transmural pressure of the enabled compartments
+    if self.all_compartments_enabled:
+      np.multiply(vol_above_unstressed, elastance, out=comp['recoil_pressure'])
+      np.add(comp['recoil_pressure'], comp['pres_outside'], out=comp['pres'])
+    else:
+      recoil_pressure = vol_above_unstressed * elastance
+      np.copyto(comp['recoil_pressure'], recoil_pressure, where=comp['is_enabled'])
+      np.copyto(comp['pres'], recoil_pressure + comp['pres_outside'], where=comp['is_enabled'])
+
+  def calculate_flows(self, comp, conn):
+    # get the pressure difference across the connectors
+    pressure_difference = comp['pres'].take(self.comp_from, axis=-1) - comp['pres'].take(self.comp_to, axis=-1)
+
+    # calculate the resistance, which depends on the direction of the pressure gradient
+    flow = conn['flow']
+    resistance = np.where(pressure_difference > 0, conn['r_for'], conn['r_back'])
+    if self.nonlinear_resistance:
+      resistance += conn['r_k1'] * flow + conn['r_k2'] * flow * flow
+
+    # calculate the flow
+    if self.all_connectors_open:
+      conn['resistance'][...] = resistance
+      np.divide(pressure_difference, resistance, out=flow)
+    else:
+      # disabled connectors keep their resistance and no_flow connectors have no flow
+      np.copyto(conn['resistance'], resistance, where=conn['is_enabled'])
+      np.divide(pressure_difference, resistance, out=flow)
+      np.copyto(flow, 0.0, where=self.conn_closed)
+
+    # block the backflow when it is not allowed
+    if self.any_no_backflow:
+      np.maximum(flow, 0.0, out=flow, where=self.conn_no_backflow)
+
+  def volume_change(self, comp, conn, t):
+    # now we have the flow in l/sec and we have to convert it to l by multiplying it by the stepsize
+    flow = conn['flow']
+    if flow.ndim == 1:
+      # add the flows to the compartments they flow into and subtract them from the compartments they flow out of (sparse form of flow @ incidence)
+      no_compartments = self.incidence.shape[1]
+      dvol = np.bincount(self.comp_to, flow, no_compartments) - np.bincount(self.comp_from, flow, no_compartments)
+    else:
+      dvol = flow @ self.incidence
+    dvol *= t
+
+    # only the enabled compartments change volume
+    if self.all_compartments_enabled:
+      return dvol
+    return dvol * comp['is_enabled']
+
+  def replicate(self, no_copies):
+    # build a network with the same topology holding the state of a number of copies as rows of a state matrix
+    network = copy.copy(self)
+    network.comp = {name: np.tile(values, (no_copies, 1)) for name, values in self.comp.items()}
+    network.conn = {name: np.tile(values, (no_copies, 1)) for name, values in self.conn.items()}
+
+    # the components stay bound to the arrays of the original network
+    network.update_masks()
+
+    return network
@@ -0,0 +1,57 @@
+import inspect
+
+# an empty method, a model step with the same code does nothing
+def _empty(self):
+  pass
+
+def is_noop(method):
+  # compare the bytecode and the constants of the method with the empty method (a wrapped method is checked instead of its wrapper)
+  method = getattr(method, '__wrapped__', method)
+  code = getattr(method, '__func__', method).__code__
+  return code.co_code == _empty.__code__.co_code and code.co_consts == _empty.__code__.co_consts
+
+def accepts_elapsed(method):
+  # a model which can run at a coarser rate takes the elapsed time as an argument of its model step
+  return 'elapsed' in inspect.signature(method).parameters
+
+
+class MultirateStep:
+  # calls the model step of a slow model every number of model steps with the elapsed time
+  def __init__(self, component, ticks, modeling_stepsize):
+    self.component = component
+    self.model_step = component.model_step
+    self.ticks = ticks
+    self.elapsed = ticks * modeling_stepsize
+
+    # the counter lives in the model, so it is stored in checkpoints and restored with rejected integration steps
+    if not isinstance(getattr(component, '_update_counter', None), int):
+      component._update_counter = 0
+
+  def __call__(self):
+    component = self.component
+    component._update_counter += 1
+    if component._update_counter >= self.ticks:
+      component._update_counter = 0
+      self.model_step(self.elapsed)
+
+
+def build_plan(model):
+  # collect the model steps which have to be called every model step, disabled models and stubs are left out
+  plan = []
+  for component in model.models.values():
+    if getattr(component, 'is_enabled', True) == False:
+      continue
+    if is_noop(component.model_step):
+      continue
+
+    # the number of model steps between the updates of the model
+    ticks = max(int(round(getattr(component, 'update_interval', model.modeling_stepsize) / model.modeling_stepsize)), 1)
+    if ticks > 1 and not accepts_elapsed(component.model_step):
+      print(f'{component.name} has no elapsed time argument in its model_step and is updated every model step')
+      ticks = 1
+
+    if ticks == 1:
+      plan.append(component.model_step)
+    else:
+      plan.append(MultirateStep(component, ticks, model.modeling_stepsize))
+  return plan
@@ -0,0 +1,181 @@
+import copy
+import json
+from functools import wraps
+from time import perf_counter
+
+class Profiler:
+  # columns of the report which can be used to sort it
+  sort_keys = ('total', 'calls', 'mean', 'name')
+
+  def __init__(self, model, breakdown = False):
+    # store a reference to the model
+    self.model = model
+
+    # time every compartment and connector on its own instead of the whole network at once
+    self.breakdown = breakdown
+
+    # timings per phase (label -> [calls, total time in seconds])
+    self.timings = {}
+
+    # the instance attributes which replaced a method, removed when the profiler is uninstalled
+    self._installed = []
+
+    self.reset()
+
+  def reset(self):
+    # clear the timings and start counting the model time again
+    for entry in self.timings.values():
+      entry[0] = 0
+      entry[1] = 0.0
+    self.start_clock = self.model.model_clock
+
+  def entry(self, label):
+    return self.timings.setdefault(label, [0, 0.0])
+
+  def timed(self, label, function):
+    # wrap a function so every call adds to the timing of the label
+    entry = self.entry(label)
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+      start = perf_counter()
+      result = function(*args, **kwargs)
+      entry[1] += perf_counter() - start
+      entry[0] += 1
+      return result
+
+    return wrapper
+
+  def replace(self, obj, name, function):
+    # shadow the method of the class with an instance attribute
+    setattr(obj, name, function)
+    self._installed.append((obj, name))
+
+  def connector_view(self, part):
+    # a copy of the network which calculates the flows of a part (slice) of the connectors, the masks are updated with the masks of the network
+    network = self.model.network
+    view = copy.copy(network)
+    view.comp_from = network.comp_from[part]
+    view.comp_to = network.comp_to[part]
+    view.conn = {name: values[..., part] for name, values in network.conn.items()}
+    view.update_masks()
+    return view
+
+  def timed_pressures(self, calculate_pressures):
+    # the pressures of every compartment are calculated on a view of its slice of the compartment arrays
+    network = self.model.network
+    compartments = [(self.entry('compartments.' + comp.name), slice(index, index + 1)) for index, comp in enumerate(network.compartments)]
+
+    def wrapper(comp):
+      for entry, part in compartments:
+        start = perf_counter()
+        calculate_pressures({name: values[..., part] for name, values in comp.items()})
+        entry[1] += perf_counter() - start
+        entry[0] += 1
+
+    return wrapper
+
+  def timed_flows(self, parts):
+    # the flows of every part of the connectors are calculated by a view of the network holding that part of the connectors
+    views = [(self.entry(label), part, self.connector_view(part)) for label, part in parts]
+    calculate_flows = type(self.model.network).calculate_flows
+
+    def wrapper(comp, conn):
+      for entry, part, view in views:
+        start = perf_counter()
+        calculate_flows(view, comp, {name: values[..., part] for name, values in conn.items()})
+        entry[1] += perf_counter() - start
+        entry[0] += 1
+
+    return wrapper, [view for _, _, view in views]
+
+  def install(self):
+    model = self.model
+    network = model.network
+    io = model.io
+
+    # the calculations are wrapped on the instances, so nothing changes in the code paths when the profiler is not installed
+    self.replace(model, 'calculate', self.timed('total', model.calculate))
+    self.replace(model, 'run_until_steady', self.timed('total', model.run_until_steady))
+
+    # the valves come first in the connector arrays, then the resistors
+    no_valves = len(model.valves)
+    if self.breakdown:
+      self.replace(network, 'calculate_pressures', self.timed_pressures(network.calculate_pressures))
+      parts = [(('valves.' if index < no_valves else 'resistors.') + conn.name, slice(index, index + 1)) for index, conn in enumerate(network.connectors)]
+    else:
+      self.replace(network, 'calculate_pressures', self.timed('network.pressures', network.calculate_pressures))
+      parts = [('network.valve_flows', slice(0, no_valves)), ('network.resistor_flows', slice(no_valves, len(network.connectors)))]
+    calculate_flows, views = self.timed_flows([(label, part) for label, part in parts if part.stop > part.start])
+    self.replace(network, 'calculate_flows', calculate_flows)
+    self.replace(network, 'volume_change', self.timed('network.volumes', network.volume_change))
+
+    # the views follow the switches of the connectors
+    update_masks = network.update_masks
+
+    def update_all_masks():
+      update_masks()
+      for view in views:
+        view.update_masks()
+
+    self.replace(network, 'update_masks', update_all_masks)
+
+    for name, component in model.models.items():
+      self.replace(component, 'model_step', self.timed('models.' + name, component.model_step))
+
+    # the euler step collects the samples in the model step of the interface, the integrators collect them between their stages and store them when an integration step is accepted
+    self.replace(io, 'collect_data', self.timed('interface.datacollector', io.collect_data))
+    self.replace(io, 'update_prop_changes', self.timed('interface.scheduler', io.update_prop_changes))
+    if model.integrator != None:
+      self.replace(model.integrator, 'store_samples', self.timed('integrator.samples', model.integrator.store_samples))
+
+    # the execution plan has to call the wrapped model steps
+    model.build_plan()
+
+  def uninstall(self):
+    for obj, name in reversed(self._installed):
+      obj.__dict__.pop(name, None)
+    self._installed = []
+    self.model.build_plan()
+
+  def results(self):
+    # machine readable results, the time which is not attributed to a phase is reported as other and phases which never ran (pruned models) are left out
+    total = self.timings.get('total', [0, 0.0])[1]
+    phases = {label: entry for label, entry in self.timings.items() if label != 'total'}
+    attributed = sum(entry[1] for entry in phases.values())
+    model_time = self.model.model_clock - self.start_clock
+
+    results = {
+      'model_time': model_time,
+      'steps': int(round(model_time / self.model.modeling_stepsize)),
+      'wall_time': total,
+      'compartments': len(self.model.network.compartments),
+      'connectors': len(self.model.network.connectors),
+      'phases': []
+    }
+    for label, (calls, time) in phases.items():
+      if calls == 0:
+        continue
+      results['phases'].append({'name': label, 'calls': calls, 'total': time, 'mean': time / calls if calls else 0.0, 'share': time / total if total else 0.0})
+    other = max(total - attributed, 0.0)
+    results['phases'].append({'name': 'other', 'calls': 0, 'total': other, 'mean': 0.0, 'share': other / total if total else 0.0})
+    return results
+
+  def report(self, sort_by = 'total'):
+    # return a table of the phases sorted by total time, number of calls, mean time or name
+    if sort_by not in self.sort_keys:
+      raise ValueError(f'sort_by must be one of {self.sort_keys}')
+
+    results = self.results()
+    phases = sorted(results['phases'], key=lambda phase: phase[sort_by], reverse=sort_by != 'name')
+
+    lines = [f"profile of {results['model_time']:.3f} s model time ({results['steps']} steps) in {results['wall_time']:.3f} s, {results['compartments']} compartments and {results['connectors']} connectors"]
+    lines.append(f"{'phase':<32}{'calls':>10}{'total (ms)':>14}{'mean (us)':>12}{'share':>9}")
+    for phase in phases:
+      lines.append(f"{phase['name']:<32}{phase['calls']:>10}{phase['total'] * 1000:>14.2f}{phase['mean'] * 1e6:>12.2f}{phase['share'] * 100:>8.1f}%")
+    return "\n".join(lines)
+
+  def save(self, path):
+    # store the results as json
+    with open(path, 'w') as file:
+      json.dump(self.results(), file, indent=2)
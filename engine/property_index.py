@@ -0,0 +1,83 @@
+from functools import partial
+
+from engine.network import Network, NetworkProperty
+
+class PropertyIndex:
+  # keys of the instance dictionary which bind a component to the network
+  binding_keys = ('_network', '_network_index', '_network_arrays')
+
+  def __init__(self, model):
+    # store a reference to the model
+    self.model = model
+
+    # the groups of the model in the order in which a name is resolved
+    self.groups = [model.compliances, model.time_varying_elastances, model.resistors, model.valves, model.models]
+
+    # the compiled references of the properties which were looked up, a reference is compiled on first use
+    self.properties = {}
+
+  def has_property(self, component, prop):
+    # the properties stored in the network are class level descriptors, the other properties live in the instance dictionary
+    if prop in self.binding_keys:
+      return False
+    return prop in component.__dict__ or isinstance(type(component).__dict__.get(prop), NetworkProperty)
+
+  def compile(self, label, component, prop):
+    reference = {'label': label, 'model': component, 'prop': prop}
+
+    arrays = component.__dict__.get('_network_arrays')
+    descriptor = type(component).__dict__.get(prop)
+    if arrays is not None and isinstance(descriptor, NetworkProperty):
+      # read and write the slot in the network array directly
+      array = arrays[descriptor.array_name]
+      index = component.__dict__['_network_index']
+      reference['array'] = array
+      reference['index'] = index
+      reference['get'] = partial(array.item, index)
+      if descriptor.array_name in Network.mask_props:
+        # changing a switch has to rebuild the masks of the network
+        reference['set'] = partial(setattr, component, prop)
+      else:
+        reference['set'] = partial(array.__setitem__, index)
+    elif prop == 'is_enabled' and component in self.model.models.values():
+      # enabling or disabling a model has to rebuild the execution plan of the model
+      reference['get'] = partial(getattr, component, prop)
+      reference['set'] = partial(self.set_model_enabled, component)
+    else:
+      reference['get'] = partial(getattr, component, prop)
+      reference['set'] = partial(setattr, component, prop)
+
+    return reference
+
+  def set_model_enabled(self, component, value):
+    component.is_enabled = value
+    self.model.build_plan()
+
+  def find(self, label):
+    # return the compiled reference of a property or None when the property doesn't exist
+    reference = self.properties.get(label)
+    if reference != None:
+      return reference
+
+    # probe the groups in order and store the compiled reference
+    t = label.split(sep=".")
+    if len(t) == 2:
+      for group in self.groups:
+        if t[0] in group and self.has_property(group[t[0]], t[1]):
+          reference = self.compile(label, group[t[0]], t[1])
+          self.properties[label] = reference
+          return reference
+
+    return None
+
+  def get(self, label):
+    # return the current value of a property
+    reference = self.find(label)
+    if reference != None:
+      return reference['get']()
+
+  def set(self, label, value):
+    # change the value of a property
+    reference = self.find(label)
+    if reference != None:
+      reference['set'](value)
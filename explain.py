@@ -1,12 +1,42 @@
+import importlib
 import json
+import numpy as np
 # import the perfomance counter module to measure the model performance
 from time import perf_counter
 # import the model interface module wich is used to interact with the model and to plot graphs
 from interface.interface import Interface
-# import all models
-from models import acidbase, ans, blood, breathing, ecg, gas, heart, lungs, metabolism, oxygenation
 # import the elements
 from elements import compliance, resistor, time_varying_elastance, valve
+# import the array-backed network engine
+from engine.network import Network
+# import the property index
+from engine.property_index import PropertyIndex
+# import the definition compiler
+from engine.compiler import compile_definition, load_compiled_definition, definition_hash
+# import the execution plan builder
+from engine.plan import build_plan
+# import the ensemble of model variants
+from engine.ensemble import Ensemble
+# import the profiler
+from engine.profiler import Profiler
+# import the checkpoint functions
+from engine.checkpoint import save_checkpoint, load_checkpoint
+# import the higher order integrators
+from engine.integrators import integrators
+
+# the module and class of every model subtype, a module is only imported when a definition uses the subtype
+model_classes = {
+  'ecg': ('models.ecg', 'Ecg'),
+  'heart': ('models.heart', 'Heart'),
+  'lungs': ('models.lungs', 'Lungs'),
+  'breathing': ('models.breathing', 'Breathing'),
+  'ans': ('models.ans', 'Ans'),
+  'metabolism': ('models.metabolism', 'Metabolism'),
+  'acidbase': ('models.acidbase', 'Acidbase'),
+  'oxygenation': ('models.oxygenation', 'Oxygenation'),
+  'blood': ('models.blood', 'Blood'),
+  'gas': ('models.gas', 'Gas')
+}
 
 # define a model class
 class Model:
@@ -19,8 +49,9 @@ class Model:
     # define a variable holding the current model clock
     self.model_clock = 0
 
-    # load and process the model definition file
-    self.model_definition = self.load_definition_JSON(model_definition_file)
+    # load, validate and compile the model definition file (cached next to the definition file)
+    self.compiled_definition = load_compiled_definition(model_definition_file)
+    self.model_definition = self.compiled_definition['definition']
 
     # initialize all model components with the parameters from the JSON file
     self.initialize(self.model_definition)
@@ -28,21 +59,20 @@ class Model:
     # define some model performance properties
     self.step_duration = 0
     self.run_duration = 0
+    self.profiler = None
     
 
-  # load and process the model definition file
-  def load_definition_JSON(self, file_name):
-    # open the JSON file
-    json_file = open(file_name)
-
-    # convert the JSON file to a python dictionary object
-    converted = json.load(json_file)
-
-    # return the dictionary
-    return converted
-
   # initialize all elements and models
   def initialize(self, model_definition):
+    # the profiler wraps the methods of the components which are replaced now
+    if getattr(self, 'profiler', None) != None:
+      self.disable_profiling()
+
+    # the compiled definition is reused when the content of the definition didn't change, otherwise it is validated and compiled again
+    compiled = getattr(self, 'compiled_definition', None)
+    if compiled == None or compiled.get('definition_hash') != definition_hash(model_definition):
+      self.compiled_definition = compile_definition(model_definition)
+
     # get the model stepsize from the model definition
     self.modeling_stepsize = model_definition['modeling_stepsize']
     # get the model name from the model definition
@@ -58,127 +88,184 @@ class Model:
     self.valves = {}
     self.models = {}
 
-    # process the elements
-    for component in model_definition['components']:
-      # initialize the compliances
-      if component['type'] == 'compliance':
-        # instantiate a compliance object, initialize it's properties and add the object to the compliances dictionary
-        _class = getattr(compliance, "Compliance")
-        self.compliances[component['name']] = _class(self, **component)
-
-      # initialize the time_varying_compliances
-      if component['type'] == 'time_varying_elastance':
-        # instantiate a time_varying_elastance object, initialize it's properties and add the object to the time_varying_elastance dictionary
-        _class = getattr(time_varying_elastance, "TimeVaryingElastance")
-        self.time_varying_elastances[component['name']] = _class(self, **component)
-
-      # initialize the connectors
-      if component['type'] == 'resistor':
-        # instantiate a resistor object, initialize it's properties and add the object to the resistors dictionary
-        _class = getattr(resistor, "Resistor")
-        self.resistors[component['name']] = _class(self, **component)
-
-      # initialize the valves
-      if component['type'] == 'valve':
-        # instantiate a valve object, initialize it's properties and add the object to the valves dictionary
-        _class = getattr(valve, "Valve")
-        self.valves[component['name']] = _class(self, **component)
+    # build the elements from the compiled definition, the references of the resistors and valves were resolved by the compiler
+    self.build_elements(self.compiled_definition['topology'])
+
+    # pack the state of the compliances, time_varying_elastances, resistors and valves into the arrays of the network
+    self.network = Network(self, self.compiled_definition['topology'])
 
     # process models
     for model in model_definition['models']:
-      # initialize the ecg model
-      if model['subtype'] == 'ecg':
-        # instantiate a ecg model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(ecg, "Ecg")
-        self.models[model['name']] = _class(self, **model)
-      # initialize the heart model
-      if model['subtype'] == 'heart':
-        # instantiate a heart model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(heart, "Heart")
-        self.models[model['name']] = _class(self, **model)
-      # initialize the lung model
-      if model['subtype'] == 'lungs':
-        # instantiate a lung model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(lungs, "Lungs")
-        self.models[model['name']] = _class(self, **model)
-      # initialize the breathing model
-      if model['subtype'] == 'breathing':
-        # instantiate a breathing model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(breathing, "Breathing")
-        self.models[model['name']] = _class(self, **model)
-      # initialize the ans model
-      if model['subtype'] == 'ans':
-        # instantiate an ans model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(ans, "Ans")
-        self.models[model['name']] = _class(self, **model)
-      # initialize the metabolism model
-      if model['subtype'] == 'metabolism':
-        # instantiate a metabolism model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(metabolism, "Metabolism")
-        self.models[model['name']] = _class(self, **model)
-      # initialize the acidbase model
-      if model['subtype'] == 'acidbase':
-        # instantiate an acidbase model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(acidbase, "Acidbase")
-        self.models[model['name']] = _class(self, **model)     
-      # initialize the oxygenation model
-      if model['subtype'] == 'oxygenation':
-        # instantiate an oxygenation model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(oxygenation, "Oxygenation")
-        self.models[model['name']] = _class(self, **model)
-      # initialize the blood model
-      if model['subtype'] == 'blood':
-        # instantiate a blood model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(blood, "Blood")
-        self.models[model['name']] = _class(self, **model)
-      # initialize the gas model  
-      if model['subtype'] == 'gas':
-        # instantiate a gas model, initialize it's properties and add the object to the models dictionary
-        _class = getattr(gas, "Gas")
-        self.models[model['name']] = _class(self, **model)
+      # instantiate the model of this subtype, initialize it's properties and add the object to the models dictionary
+      _class = self.load_model_class(model['subtype'])
+      self.models[model['name']] = _class(self, **model)
+
+    # build the list of model steps which are executed every model step
+    self.build_plan()
+
+    # build the index of all properties of the components and models
+    self.properties = PropertyIndex(self)
 
     # initialize the model interface
     self.io = Interface(self)
 
+    # select the integrator, by default the forward euler step at the modeling stepsize
+    self.set_integrator(model_definition.get('integrator', 'euler'), **model_definition.get('integrator_settings', {}))
+
+  # instantiate the compliances, time_varying_elastances, valves and resistors of a compiled topology
+  def build_elements(self, topology):
+    element_classes = {
+      'compliance': (compliance.Compliance, self.compliances),
+      'time_varying_elastance': (time_varying_elastance.TimeVaryingElastance, self.time_varying_elastances),
+      'resistor': (resistor.Resistor, self.resistors),
+      'valve': (valve.Valve, self.valves)
+    }
+
+    # the compartments are built first, so the resistors and valves find the compartments they connect
+    # the properties stored in the network arrays are taken from the compiled arrays when the network binds the elements, so only the other attributes are passed
+    for names, attributes in [(topology['compartments'], topology['comp_attributes']), (topology['connectors'], topology['conn_attributes'])]:
+      for name, element_attributes in zip(names, attributes):
+        _class, group = element_classes[element_attributes['type']]
+        group[name] = _class(self, **element_attributes)
+
+  # import the module of a model subtype on first use and return the model class
+  def load_model_class(self, subtype):
+    module_name, class_name = model_classes[subtype]
+    return getattr(importlib.import_module(module_name), class_name)
+
+  # rebuild the list of model steps, called when a model is enabled or disabled
+  def build_plan(self):
+    self.plan = build_plan(self)
+
+  # select the integrator (euler, rk4, rk45 or implicit)
+  def set_integrator(self, name, **settings):
+    if name == 'euler':
+      self.integrator = None
+    elif name in integrators:
+      self.integrator = integrators[name](self, **settings)
+    else:
+      print(f'integrator {name} not found, using euler')
+      self.integrator = None
+
+  # build an ensemble which advances variants of this model (dictionaries of property overrides) in one step loop
+  def ensemble(self, variants):
+    return Ensemble(self, variants)
+
+  # attribute the calculation time to the phases of the model step, returns the profiler holding the timings
+  # with breakdown the time of the network is attributed to every compartment and connector, which makes the network calculations a lot slower
+  def enable_profiling(self, breakdown = False):
+    if self.profiler == None:
+      self.profiler = Profiler(self, breakdown)
+      self.profiler.install()
+    return self.profiler
+
+  # remove the profiling wrappers, the timings stay available in the returned profiler
+  def disable_profiling(self):
+    profiler = self.profiler
+    if profiler != None:
+      profiler.uninstall()
+      self.profiler = None
+    return profiler
+
+  # store the full dynamic state of the model in a binary checkpoint file
+  def save_checkpoint(self, path):
+    save_checkpoint(self, path)
+
+  # restore the dynamic state of the model from a checkpoint file saved with the same definition
+  def load_checkpoint(self, path):
+    load_checkpoint(self, path)
+
+  # calculate a number of model steps, used to advance the model in chunks
+  def calculate_steps(self, no_steps):
+    # half a step extra, so the number of steps calculated is not affected by the rounding of the time
+    self.calculate((no_steps + 0.5) * self.modeling_stepsize)
+
   # calculate a number of seconds
   def calculate(self, time_to_calculate):
+    # the higher order integrators take care of the model steps themselves
+    if self.integrator != None:
+      self.integrator.calculate(time_to_calculate)
+      return
+
     # calculate the number of steps needed (= time in seconds / modeling stepsize in seconds)
     no_steps = int(time_to_calculate / self.modeling_stepsize)
-    
+
+    # make sure the datacollector can hold the samples of this run
+    self.io.dc.reserve(no_steps)
+
     # start the performance counter
     perf_start = perf_counter()
 
     # execute the model steps
     for _ in range(no_steps):
+      self.step()
 
-      # calculate the transmural pressures of the compliances and time_varying_elastances
-      for tve in self.time_varying_elastances:
-        self.time_varying_elastances[tve].calculate_pressure()
-      
-      for comp in self.compliances:
-        self.compliances[comp].calculate_pressure()
+    # stop the performance counter
+    perf_stop = perf_counter()
 
-      # calculate the flows across the resistors and valves and update the volumes of the compliances and time_varying_elastances
-      for valve in self.valves:
-        self.valves[valve].calculate_flow()
+    # store the performance metrics
+    self.run_duration = perf_stop - perf_start
+    self.step_duration = (self.run_duration / no_steps) * 1000
 
-      for res in self.resistors:
-        self.resistors[res].calculate_flow()
+  # execute a single model step
+  def step(self):
+    # calculate the transmural pressures of the compliances and time_varying_elastances, the flows across the resistors and valves and update the volumes
+    self.network.step()
 
-      # calculate the influence of the models on the elements
-      for model in self.models:
-        self.models[model].model_step()
+    # calculate the influence of the enabled models on the elements
+    for model_step in self.plan:
+      model_step()
 
-      # call the user interface
-      self.io.model_step(self.model_clock)
+    # call the user interface
+    self.io.model_step(self.model_clock)
 
-      # increase the model clock
-      self.model_clock += self.modeling_stepsize
+    # increase the model clock
+    self.model_clock += self.modeling_stepsize
 
+  # calculate until the end-diastolic volumes and pressures no longer change from beat to beat
+  def run_until_steady(self, tolerance = 0.001, max_time = 600, min_beats = 3):
+    ecg = self.models['ecg']
+    comp = self.network.comp
+
+    # pressures below 1 mmHg are compared on an absolute scale
+    pressure_scale = 1.0
+
+    # the ventricular trigger is only seen at every model step with the euler step, a selected integrator is not used
+    if self.integrator != None:
+      print(f'run_until_steady uses the euler step, the {type(self.integrator).__name__} integrator is not used')
+
+    max_steps = int(max_time / self.modeling_stepsize)
+    self.io.dc.reserve(max_steps)
+
+    beats = 0
+    change = float('inf')
+    previous = None
+    no_steps = 0
+
+    perf_start = perf_counter()
+
+    for step in range(max_steps):
+      # the model is stepped with the euler step so the ventricular trigger is seen at every model step
+      self.step()
+      no_steps = step + 1
+
+      # the ventricular activation counter is 0 right after the ventricular trigger (end-diastole)
+      if ecg.ncc_ventricular == 0:
+        current = (comp['vol'].copy(), comp['pres'].copy())
+        if previous != None:
+          beats += 1
+          # calculate the largest relative beat-to-beat change of the end-diastolic volumes and pressures
+          vol_change = np.abs(current[0] - previous[0]) / np.maximum(np.abs(previous[0]), 1e-9)
+          pres_change = np.abs(current[1] - previous[1]) / np.maximum(np.abs(previous[1]), pressure_scale)
+          change = float(max(np.max(vol_change), np.max(pres_change)))
+          if beats >= min_beats and change < tolerance:
+            break
+        previous = current
 
-    # stop the performance counter
     perf_stop = perf_counter()
 
     # store the performance metrics
     self.run_duration = perf_stop - perf_start
-    self.step_duration = (self.run_duration / no_steps) * 1000
+    self.step_duration = (self.run_duration / max(no_steps, 1)) * 1000
+
+    return {'steady': change < tolerance, 'beats': beats, 'time': no_steps * self.modeling_stepsize, 'change': change}
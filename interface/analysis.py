@@ -0,0 +1,75 @@
+import numpy as np
+
+def beat_starts(ncc_ventricular):
+  # a heartbeat starts at every sample where the ventricular activation counter was reset, which doesn't depend on the sample interval
+  ncc_ventricular = np.asarray(ncc_ventricular)
+  return np.flatnonzero(np.diff(ncc_ventricular) < 0) + 1
+
+def segment_beats(time, ncc_ventricular):
+  # return the first sample of every complete beat, the sample after the last beat, the start times and the durations of the beats
+  starts = beat_starts(ncc_ventricular)
+  if len(starts) < 2:
+    return starts[:0], None, time[:0], time[:0]
+
+  # the beat ends where the next beat starts, the samples before the first and after the last trigger are incomplete beats
+  beat_time = time[starts]
+  return starts[:-1], starts[-1], beat_time[:-1], np.diff(beat_time)
+
+def analyze_recording(time, signals, ncc_ventricular):
+  # calculate the per beat statistics of the signals (dictionary of label and samples) in one pass per statistic
+  time = np.asarray(time)
+  starts, end, beat_time, duration = segment_beats(time, ncc_ventricular)
+
+  # without a complete beat the whole recording is treated as a single segment
+  complete = len(starts) > 0
+  if not complete:
+    starts, end = np.array([0]), len(time)
+    beat_time = time[:1]
+    duration = np.array([time[-1] - time[0] if len(time) > 1 else 0.0])
+
+  # the samples are evenly spaced
+  dt = (time[-1] - time[0]) / (len(time) - 1) if len(time) > 1 else 0.0
+  counts = np.diff(np.append(starts, end))
+  first = starts[0]
+  offsets = starts - first
+
+  result = {
+    'beats': len(starts) if complete else 0,
+    'beat_time': beat_time,
+    'beat_duration': duration,
+    'heart_rate': 60.0 / duration if complete else np.full(1, np.nan)
+  }
+
+  for label, data in signals.items():
+    data = np.asarray(data)[first:end]
+    maximum = np.maximum.reduceat(data, offsets)
+    minimum = np.minimum.reduceat(data, offsets)
+    mean = np.add.reduceat(data, offsets) / counts
+    prop = label.split(sep=".")[-1]
+
+    if prop == 'pres':
+      result[label] = {'systolic': maximum, 'diastolic': minimum, 'mean': mean}
+    elif prop == 'vol':
+      result[label] = {'max': maximum, 'min': minimum, 'mean': mean, 'stroke_volume': maximum - minimum}
+    elif prop == 'flow':
+      # the volumes moved forward and backward during the beat
+      forward = np.add.reduceat(np.maximum(data, 0), offsets) * dt
+      backward = -np.add.reduceat(np.minimum(data, 0), offsets) * dt
+      net = forward - backward
+      with np.errstate(divide='ignore', invalid='ignore'):
+        cardiac_output = net / (counts * dt) * 60
+        regurgitant_fraction = np.where(forward > 0, backward / forward, np.nan)
+      result[label] = {
+        'max': maximum,
+        'min': minimum,
+        'mean': mean,
+        'stroke_volume': net if complete else np.full(1, np.nan),
+        'forward_volume': forward,
+        'regurgitant_volume': backward,
+        'regurgitant_fraction': regurgitant_fraction,
+        'cardiac_output': cardiac_output
+      }
+    else:
+      result[label] = {'max': maximum, 'min': minimum, 'mean': mean}
+
+  return result
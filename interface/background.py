@@ -0,0 +1,114 @@
+import threading
+from time import perf_counter
+
+class BackgroundRun:
+  # calculates the model on a worker thread in chunks, between the chunks the run can be paused, cancelled and its data read
+  def __init__(self, model, time_to_calculate, chunk_duration = 1.0):
+    # store a reference to the model
+    self.model = model
+
+    # the run expressed in model steps and the number of model steps per chunk
+    self._t = model.modeling_stepsize
+    self.total_steps = int(time_to_calculate / self._t)
+    self.chunk_steps = max(int(round(chunk_duration / self._t)), 1)
+
+    # the model is only calculated or read while holding the lock, so the data is never read halfway a chunk
+    self.lock = threading.Lock()
+    self._running = threading.Event()
+    self._running.set()
+    self._cancelled = False
+    self._thread = None
+
+    # state of the run (created, running, paused, cancelled, finished or failed)
+    self.state = 'created'
+    self.error = None
+    self.steps_done = 0
+    # the wall clock time spent calculating, the time the run was paused is left out
+    self.run_duration = 0.0
+
+  def start(self):
+    self.state = 'running'
+    self._thread = threading.Thread(target=self.run, daemon=True)
+    self._thread.start()
+    return self
+
+  def run(self):
+    try:
+      # make sure the datacollector can hold the samples of the whole run
+      with self.lock:
+        self.model.io.dc.reserve(self.total_steps)
+
+      while self.steps_done < self.total_steps:
+        # wait while the run is paused, a cancel also wakes up a paused run
+        self._running.wait()
+        if self._cancelled:
+          self.state = 'cancelled'
+          return
+
+        # only the time spent calculating counts, so a pause doesn't lower the speed or raise the eta
+        chunk_start = perf_counter()
+        steps = min(self.chunk_steps, self.total_steps - self.steps_done)
+        with self.lock:
+          self.model.calculate_steps(steps)
+        self.steps_done += steps
+        self.run_duration += perf_counter() - chunk_start
+
+      self.state = 'finished'
+    except Exception as error:
+      self.error = error
+      self.state = 'failed'
+
+  def pause(self):
+    # pause at the next chunk boundary
+    if self.state == 'running':
+      self._running.clear()
+      self.state = 'paused'
+
+  def resume(self):
+    if self.state == 'paused':
+      self.state = 'running'
+      self._running.set()
+
+  def cancel(self):
+    # stop at the next chunk boundary, the data calculated so far stays available
+    self._cancelled = True
+    self._running.set()
+
+  def wait(self, timeout = None):
+    # wait until the run is finished, cancelled or failed, returns whether it is done
+    if self._thread != None:
+      self._thread.join(timeout)
+    return self.done
+
+  @property
+  def done(self):
+    return self.state in ('cancelled', 'finished', 'failed')
+
+  def progress(self):
+    # the calculated model time, the calculation speed and the estimated remaining wall clock time
+    steps_per_second = self.steps_done / self.run_duration if self.run_duration > 0 else 0.0
+    remaining = self.total_steps - self.steps_done
+    return {
+      'state': self.state,
+      'model_time': self.steps_done * self._t,
+      'time_to_calculate': self.total_steps * self._t,
+      'fraction': self.steps_done / self.total_steps if self.total_steps > 0 else 1.0,
+      'steps_per_second': steps_per_second,
+      'eta': remaining / steps_per_second if steps_per_second > 0 and not self.done else None
+    }
+
+  def get_time(self):
+    # return a copy of the sample times collected so far
+    with self.lock:
+      return self.model.io.dc.get_time().copy()
+
+  def get_data(self, label):
+    # return a copy of the samples of a watched property collected so far
+    with self.lock:
+      data = self.model.io.dc.get_data(label)
+      return None if data is None else data.copy()
+
+  def __repr__(self):
+    p = self.progress()
+    eta = '' if p['eta'] == None else f", eta {round(p['eta'], 1)} sec."
+    return f"<BackgroundRun {p['state']} {round(p['model_time'], 3)}/{round(p['time_to_calculate'], 3)} sec. ({round(p['fraction'] * 100, 1)}%), {round(p['steps_per_second'])} steps/s{eta}>"
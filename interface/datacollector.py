@@ -1,4 +1,6 @@
 import math
+from functools import partial
+import numpy as np
 
 class Datacollector:
   def __init__(self, model):
@@ -11,58 +13,122 @@ class Datacollector:
     # define the watch list
     self.watch_list = []
 
-    # define the data sample interval
-    self.sample_interval = 0.005
-    self._interval_counter = 0
-
     # get the modeling stepsize from the model
     self.modeling_stepsize = model.modeling_stepsize
 
+    # define the data sample interval, a sample is taken every _sample_steps model steps
+    self.set_sample_interval(0.005)
+    self._step_counter = 0
+
     # add two always needed properties to the watchlist
     self.ncc_ventricular = {'label': 'ecg.ncc_ventricular', 'model': self.model.models['ecg'], 'prop': 'ncc_ventricular'}
     self.ncc_atrial = {'label': 'ecg.ncc_atrial', 'model': self.model.models['ecg'], 'prop': 'ncc_atrial'}
 
-    # define the data list
-    self.collected_data = []
+    # define the data columns, the first column holds the model time
+    self._accessors = []
+    self._columns = np.zeros((1, 0))
+    self.no_samples = 0
 
     # add the two always there
-    self.watch_list.append(self.ncc_atrial)
-    self.watch_list.append(self.ncc_ventricular)
+    self.clear_watchlist()
 
   def clear_data (self):
-    self.collected_data = []
+    # preallocate a column for the time and every watched property
+    self._columns = np.zeros((len(self.watch_list) + 1, 1024))
+    self.no_samples = 0
+    # the first sample after clearing is a whole sample interval away, whatever was sampled before
+    self._step_counter = 0
 
   def clear_watchlist(self):
-    # first clear all data
-    self.clear_data()
-
     # empty the watch list
     self.watch_list = []
+    self._accessors = []
 
     # add the two always there
-    self.watch_list.append(self.ncc_atrial)
-    self.watch_list.append(self.ncc_ventricular)
+    self.add_to_watchlist(self.ncc_atrial)
+    self.add_to_watchlist(self.ncc_ventricular)
 
   def set_sample_interval(self, new_interval):
     self.sample_interval = new_interval
+    # the sample decision is based on the number of model steps, so the samples are evenly spaced
+    self._sample_steps = max(int(round(new_interval / self.modeling_stepsize)), 1)
 
   def add_to_watchlist(self, property):
-    # first clear all data
-    self.clear_data()
-
     # add to the watchlist
     self.watch_list.append(property)
+    self._accessors.append(self.compile_accessor(property))
+
+    # clear all data as the columns have changed
+    self.clear_data()
+
+  def compile_accessor(self, property):
+    # use the precompiled getter of the property index
+    if 'get' in property:
+      return property['get']
+
+    # properties which are not in the index are read with getattr
+    return partial(getattr, property['model'], property['prop'])
+
+  def close(self):
+    # the samples are held in memory, there is no file to close
+    pass
+
+  def reserve(self, no_steps):
+    # make sure the columns can hold the samples of the coming model steps
+    needed = self.no_samples + no_steps // self._sample_steps + 1
+    if needed > self._columns.shape[1]:
+      self.grow(needed)
+
+  def grow(self, minimal_size):
+    # double the size of the columns until the samples fit
+    size = max(self._columns.shape[1], 1)
+    while size < minimal_size:
+      size *= 2
+    columns = np.zeros((self._columns.shape[0], size))
+    columns[:, :self.no_samples] = self._columns[:, :self.no_samples]
+    self._columns = columns
 
   def collect_data(self, model_clock):
-    if (self._interval_counter >= self.sample_interval):
-      self._interval_counter = 0
-      data_object = {
-        'time': model_clock
-      }
-      for parameter in self.watch_list:
-        label = parameter['label']
-        value = getattr(parameter['model'], parameter['prop'])
-        data_object[label] = value
-      self.collected_data.append(data_object)
-    
-    self._interval_counter += self.modeling_stepsize
\ No newline at end of file
+    if self.sample_due():
+      self.store_sample(model_clock, self.read_values())
+
+  def sample_due(self):
+    # advance the step counter by one model step and return whether a sample should be taken
+    due = self._step_counter >= self._sample_steps
+    if due:
+      self._step_counter = 0
+
+    self._step_counter += 1
+
+    return due
+
+  def read_values(self):
+    # read the current values of the watched properties
+    return [accessor() for accessor in self._accessors]
+
+  def store_sample(self, model_clock, values):
+    if self.no_samples == self._columns.shape[1]:
+      self.grow(self.no_samples + 1)
+
+    self._columns[0, self.no_samples] = model_clock
+    self._columns[1:, self.no_samples] = values
+    self.no_samples += 1
+
+  def get_block(self, start = 0):
+    # return a copy of the samples from sample number start onwards, the first row holds the sample times
+    return self._columns[:, start:self.no_samples].copy()
+
+  def drop_samples(self):
+    # forget the collected samples but keep the watch list, so a consumer of the samples keeps the memory use bounded
+    self.no_samples = 0
+
+  def get_time(self):
+    # return a view on the sample times
+    return self._columns[0, :self.no_samples]
+
+  def get_data(self, label):
+    # return a view on the samples of a watched property
+    for index, parameter in enumerate(self.watch_list):
+      if parameter['label'] == label:
+        return self._columns[index + 1, :self.no_samples]
+    return None
@@ -0,0 +1,75 @@
+import numpy as np
+
+def window_indices(time, window):
+  # return the first and the last + 1 sample of the time window (start, end), None is the whole recording
+  if window == None:
+    return 0, len(time)
+  start = np.searchsorted(time, window[0], side='left')
+  end = np.searchsorted(time, window[1], side='right')
+  return start, end
+
+def minmax_indices(y, buckets):
+  # divide the samples in buckets and keep the smallest and the largest sample of every bucket, so every peak stays visible
+  n = len(y)
+  if n <= 2 * buckets:
+    return np.arange(n)
+
+  size = n // buckets
+  m = (n // size) * size
+  blocks = y[:m].reshape(-1, size)
+  base = np.arange(blocks.shape[0])[:, None] * size
+  indices = [np.sort(np.column_stack((blocks.argmin(axis=1), blocks.argmax(axis=1))), axis=1) + base]
+
+  # the samples which don't fill a whole bucket
+  if m < n:
+    tail = y[m:]
+    indices.append(np.array([m + tail.argmin(), m + tail.argmax()]))
+
+  # the first and the last sample keep the line running over the whole window
+  indices.append(np.array([0, n - 1]))
+  return np.unique(np.concatenate([index.ravel() for index in indices]))
+
+def minmax_decimate(x, y, buckets):
+  # reduce a time series to at most about 2 samples per bucket (pixel)
+  indices = minmax_indices(np.asarray(y), buckets)
+  return x[indices], y[indices]
+
+def xy_decimate(x, y, buckets):
+  # reduce an xy curve (e.g. a pressure volume loop) by keeping the extremes of both coordinates in every bucket of consecutive samples
+  x = np.asarray(x)
+  y = np.asarray(y)
+  if len(x) <= 4 * buckets:
+    return x, y
+  indices = np.union1d(minmax_indices(x, buckets), minmax_indices(y, buckets))
+  return x[indices], y[indices]
+
+def pixel_width(axes):
+  # the number of pixels the axes are wide, which is the number of buckets
+  figure = axes.figure
+  return max(int(axes.get_position().width * figure.get_figwidth() * figure.dpi), 1)
+
+
+class DecimatedLine:
+  # a line of a time graph which is decimated again from the full resolution samples when the visible time window changes
+  def __init__(self, line, time, data):
+    self.line = line
+    self.time = time
+    self.data = data
+
+  def redraw(self, window, buckets):
+    # one sample outside the window on both sides, so the line runs to the edges of the axes
+    start, end = window_indices(self.time, window)
+    start, end = max(start - 1, 0), min(end + 1, len(self.time))
+    x, y = minmax_decimate(self.time[start:end], self.data[start:end], buckets)
+    self.line.set_data(x, y)
+
+
+def attach_zoom(axes, lines):
+  # decimate the lines of the axes again when the x limits change (zoom and pan of an interactive backend)
+  def on_xlim_changed(axes):
+    window = axes.get_xlim()
+    buckets = pixel_width(axes)
+    for line in lines:
+      line.redraw(window, buckets)
+
+  axes.callbacks.connect('xlim_changed', on_xlim_changed)
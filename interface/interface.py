@@ -1,12 +1,21 @@
 import math
-from typing import ChainMap
-import matplotlib.pyplot as plt
 import numpy as np
 
 import warnings
 warnings.filterwarnings("ignore")
 
 from interface.datacollector import Datacollector
+from interface.scheduler import Scheduler
+
+# matplotlib is imported when the first graph is drawn, so the model runs headless without loading it
+plt = None
+
+def pyplot():
+  global plt
+  if plt is None:
+    import matplotlib.pyplot
+    plt = matplotlib.pyplot
+  return plt
 
 class Interface:
   def __init__(self, model):
@@ -25,43 +34,120 @@ class Interface:
     # plot line colors
     self.lines = ['r-', 'b-', 'g-', 'c-', 'm-', 'y-', 'k-', 'w-']
 
-    # define a list holding the prop changes
-    self.propChanges = []
+    # define a scheduler holding the prop changes
     self.prop_update_interval = 0.015
-    self.prop_update_counter = 0
+    self.scheduler = Scheduler(self.t, self.prop_update_interval)
+
+    # the per beat statistics collected while the model runs (see collect_trends)
+    self.trends = None
+
+  def record_to_file(self, path, chunk_size = 8192):
+    # stream the collected data to a memory mapped recording file instead of keeping it in memory
+    # the writer thread and memory map modules are imported on first use
+    from interface.recorder import StreamingRecorder
+    self.switch_datacollector(StreamingRecorder(self.model, path, chunk_size))
+
+  def record_in_memory(self):
+    # keep the collected data in memory (default)
+    self.switch_datacollector(Datacollector(self.model))
+
+  def switch_datacollector(self, dc):
+    # take over the sample interval and the watch list of the current datacollector
+    dc.set_sample_interval(self.dc.sample_interval)
+    for watched_parameter in self.dc.watch_list[2:]:
+      dc.add_to_watchlist(watched_parameter)
+
+    # close the recording file of the current datacollector
+    self.dc.close()
+
+    self.dc = dc
 
   def calculate(self, time_to_calculate):
     # calculate the model steps
     no_steps = int(time_to_calculate / self.model.modeling_stepsize)
     print(f'Calculating model run of {time_to_calculate} sec. in {no_steps} steps.')
-    self.prop_update_counter = 0
     self.model.calculate(time_to_calculate)
     run_duration = round(self.model.run_duration, 3)
     step_duration = round(self.model.step_duration, 4)
     print(f'Ready in {run_duration} sec. Average model step in {step_duration} ms.')
 
+  def calculate_in_background(self, time_to_calculate, chunk_duration = 1.0):
+    # calculate the model steps on a worker thread, the returned run reports its progress and can be paused, resumed and cancelled
+    # the worker thread module is imported on first use
+    from interface.background import BackgroundRun
+    print(f'Calculating model run of {time_to_calculate} sec. in the background.')
+    return BackgroundRun(self.model, time_to_calculate, chunk_duration).start()
+
+  def run_until_steady(self, tolerance = 0.001, max_time = 600, min_beats = 3):
+    print(f'Calculating until the beat-to-beat change is below {tolerance} (max. {max_time} sec.).')
+    result = self.model.run_until_steady(tolerance, max_time, min_beats)
+    run_duration = round(self.model.run_duration, 3)
+    if result['steady']:
+      print(f"Steady state after {result['beats']} beats ({round(result['time'], 3)} sec.) in {run_duration} sec.")
+    else:
+      print(f"No steady state after {result['beats']} beats ({round(result['time'], 3)} sec.), last change {result['change']}.")
+    return result
+
+  def realtime(self, realtime_factor = 1.0, **settings):
+    # return a runner which calculates the model locked to the wall clock, iterate over runner.stream(duration) in an asyncio task to get the samples
+    # asyncio is imported on first use, so the model runs headless without loading it
+    from interface.realtime import RealtimeRunner
+    return RealtimeRunner(self.model, realtime_factor, **settings)
+
+  def stream_server(self, host = '127.0.0.1', port = 5750, path = None, realtime_factor = 1.0, **settings):
+    # return a server which runs the model in real time and streams the subscribed properties to local clients, run it with await server.serve(duration)
+    # the socket and asyncio modules are imported on first use
+    from interface.server import StreamServer
+    return StreamServer(self.model, host, port, path, realtime_factor, **settings)
+
+  def collect_trends(self, properties = ('AA.pres', 'LV_AA.flow', 'LV.vol'), trend_interval = None, sample_interval = 0.005, on_record = None, max_records = 10000):
+    # collect per beat (or per trend interval) records of the properties during the next model runs, without storing the samples
+    from interface.trends import TrendCollector
+    self.trends = TrendCollector(self.model, properties, sample_interval, trend_interval, on_record, max_records)
+    return self.trends
+
+  def stop_trends(self):
+    # stop collecting trends, the record of the running trend interval is emitted
+    trends = self.trends
+    if trends != None:
+      trends.flush()
+      self.trends = None
+    return trends
+
   def model_step(self, model_clock):
-    self.dc.collect_data(model_clock)
-    # process the propchanges
-    if (self.prop_update_counter >= self.prop_update_interval):
-      self.prop_update_counter = 0
-      for change in self.propChanges:
-        change.update()
-        if change.completed:
-          self.propChanges.remove(change)
-
-    self.prop_update_counter += self.t
-      
+    self.collect_data(model_clock)
+    self.update_prop_changes()
+
+  def collect_data(self, model_clock, pending = None):
+    # take the samples of the datacollector and the trend collector which are due at this model step
+    # the integrators pass a list which holds the samples until their integration step is accepted
+    dc = self.dc
+    if dc.sample_due():
+      if pending is None:
+        dc.store_sample(model_clock, dc.read_values())
+      else:
+        pending.append((dc, model_clock, dc.read_values()))
+
+    trends = self.trends
+    if trends != None and trends.sample_due():
+      if pending is None:
+        trends.store_sample(model_clock, trends.read_values())
+      else:
+        pending.append((trends, model_clock, trends.read_values()))
+
+  def update_prop_changes(self):
+    # process the propchanges which are due at this model step
+    self.scheduler.step()
+
   def schedule_prop_change(self, prop, new_value, in_time, at_time = 0):
     prop = self.find_model_prop(prop)
     if (prop != None):
       # check whether the type of new_value is the same as the model type
-      if type(new_value) == type(getattr(prop['model'], prop['prop'])):
-        new_prop_change = propChange(prop, new_value, in_time, at_time)
-        self.propChanges.append(new_prop_change)
+      if self.type_matches(prop['get'](), new_value):
+        new_prop_change = self.scheduler.schedule(prop, new_value, in_time, at_time)
         print(f"{prop['label']} is scheduled to change from {new_prop_change.initial_value} to {new_value} in {in_time} sec. at {at_time} sec. during next model run.")
       else:
-        current_value_type = type(getattr(prop['model'], prop['prop']))
+        current_value_type = type(prop['get']())
         new_value_type = type(new_value)
         print(f'property type mismatch. model property type = {current_value_type}, new value type = {new_value_type}')
     else:
@@ -73,18 +159,25 @@ class Interface:
     
     if (prop != None):
       # check whether the type of new_value is the same as the model type
-      if type(new_value) == type(getattr(prop['model'], prop['prop'])):
-        setattr(prop['model'], prop['prop'], new_value)
-        current_value = getattr(prop['model'], prop['prop'])
+      if self.type_matches(prop['get'](), new_value):
+        prop['set'](new_value)
+        current_value = prop['get']()
         label = prop['label']
         print(f'{label} changed from {current_value} to {new_value}.')
       else:
-        current_value_type = type(getattr(prop['model'], prop['prop']))
+        current_value_type = type(prop['get']())
         new_value_type = type(new_value)
         print(f'property type mismatch. model property type = {current_value_type}, new value type = {new_value_type}')
     else:
       print("property not found in model")
   
+  def type_matches(self, current_value, new_value):
+    # the properties of the compliances, resistors and valves are stored as floats in the network, so integers and floats are interchangeable
+    numbers = (int, float)
+    if type(current_value) in numbers and type(new_value) in numbers:
+      return True
+    return type(new_value) == type(current_value)
+
   def plot_heart_pres(self):
     self.plot_time(["LV.pres","RV.pres","LA.pres", "RA.pres", "AA.pres"], 5, True, True, 0.005)
 
@@ -209,61 +302,33 @@ class Interface:
 
     print("")
 
-    parameters = []
-    no_parameters = 0
-    # get the watch list of the datacollector
-    for watched_parameter in self.dc.watch_list:
-      parameters.append(watched_parameter['label'])
-
-    no_dp = len(self.dc.collected_data)
-    x = np.zeros(no_dp)
-    y = []
-    heartbeats = 0
-
-    for parameter in enumerate(parameters):
-      y.append(np.zeros(no_dp))
-      no_parameters += 1
-
-    for index,t in enumerate(self.dc.collected_data):
-      x[index] = t['time']
-
-      for idx, parameter in enumerate(parameters):
-        y[idx][index] = t[parameter]
-
-    for idx, parameter in enumerate(parameters):
-      prop_category  = parameter.split(sep=".")
-
-      if prop_category[1] == "pres":
-        data = np.array(y[idx])
-        max = round(np.amax(data), 5)
-        min = round(np.amin(data), 5)
-
-        print("{:<10} max : {:<10} min: {:<10} mmHg". format(parameter, max, min))
-      
-      if prop_category[1] == "vol":
-        data = np.array(y[idx])
-        max = round(np.amax(data), 5)
-        min = round(np.amin(data), 5)
-
-        print("{:<10} max : {:<10} min: {:<10} liter". format(parameter, max, min))
-
-      if prop_category[1] == "flow":
-        data = np.array(y[idx])
-        t_start = x[0]
-        t_end = x[-1]
-        sum = np.sum(data)
-        flow = (sum * sampleinterval / (t_end - t_start)) * 60
-        flow = round(flow, 5)
-        bpm = (heartbeats / (t_end - t_start)) * 60
-        sv = (sum * sampleinterval / (t_end - t_start))  * 60 / bpm
-        sv = round(sv * 1000, 5)
-
-        print("{:<16}: {:<8} l/min, stroke volume: {:<5} ml". format(parameter, flow, sv))
-
-      if prop_category[1] == "ncc_ventricular":
-        data = np.array(y[idx])
-        heartbeats = np.count_nonzero(data == 0)
-        
+    # get the sample times and the columns of the watched properties
+    labels = [watched_parameter['label'] for watched_parameter in self.dc.watch_list[2:]]
+    signals = {label: self.dc.get_data(label) for label in labels}
+    from interface.analysis import analyze_recording
+    result = analyze_recording(self.dc.get_time(), signals, self.dc.get_data('ecg.ncc_ventricular'))
+
+    # print the averages of the per beat values
+    heart_rate = round(np.mean(result['heart_rate']), 5)
+    print("{:<16}: {:<8} bpm ({} beats)". format('heart rate', heart_rate, result['beats']))
+
+    for label in labels:
+      values = {key: round(np.mean(value), 5) for key, value in result[label].items()}
+      prop = label.split(sep=".")[1]
+
+      if prop == "pres":
+        print("{:<10} syst : {:<10} diast: {:<10} mean: {:<10} mmHg". format(label, values['systolic'], values['diastolic'], values['mean']))
+
+      if prop == "vol":
+        print("{:<10} max : {:<10} min: {:<10} liter". format(label, values['max'], values['min']))
+
+      if prop == "flow":
+        stroke_volume = round(values['stroke_volume'] * 1000, 5)
+        regurgitant_fraction = round(values['regurgitant_fraction'] * 100, 3)
+        print("{:<16}: {:<8} l/min, stroke volume: {:<5} ml, regurgitant fraction: {} %". format(label, values['cardiac_output'], stroke_volume, regurgitant_fraction))
+
+    return result
+
   def plot_time (self, properties, time_to_calculate = 10,  combined = True, sharey = True, sampleinterval = 0.005):
     # first clear the watchllist and this also clears all data
     self.dc.clear_watchlist()
@@ -307,16 +372,18 @@ class Interface:
 
     self.draw_xy_graph(property_x, property_y)
 
-  def draw_xy_graph(self, property_x, property_y):
-    no_dp = len(self.dc.collected_data)
-    x = np.zeros(no_dp)
-    y = np.zeros(no_dp)
+  def draw_xy_graph(self, property_x, property_y, window = None):
+    plt = pyplot()
+    from interface.decimation import window_indices, xy_decimate, pixel_width
 
-    for index,t in enumerate(self.dc.collected_data):
-      x[index] = t[property_x]
-      y[index] = t[property_y]
+    # the samples of the time window (start, end) in seconds, by default the whole run
+    start, end = window_indices(self.dc.get_time(), window)
+    x = self.dc.get_data(property_x)[start:end]
+    y = self.dc.get_data(property_y)[start:end]
 
     plt.figure( figsize=(18, 5), dpi=300)
+    # reduce the samples to what the width of the figure can show
+    x, y = xy_decimate(x, y, pixel_width(plt.gca()))
     # Subplot of figure 1 with id 211 the data (red line r-, first legend = parameter)
     plt.plot(x, y, self.lines[0], linewidth=1 )
     plt.xlabel(property_x)
@@ -324,28 +391,32 @@ class Interface:
 
     plt.show()
 
-  def draw_time_graph(self, sharey = False, combined = True):
+  def draw_time_graph(self, sharey = False, combined = True, window = None):
+    plt = pyplot()
+    from interface.decimation import pixel_width, DecimatedLine, attach_zoom
+
     parameters = []
-    no_parameters = 0
     # get the watch list of the datacollector
     for watched_parameter in self.dc.watch_list:
       if (watched_parameter['label'] != "ecg.ncc_ventricular" and watched_parameter['label'] != "ecg.ncc_atrial"):
         parameters.append(watched_parameter['label'])
 
-    no_dp = len(self.dc.collected_data)
-    x = np.zeros(no_dp)
-    y = []
+    no_parameters = len(parameters)
 
-    for parameter in enumerate(parameters):
-      y.append(np.zeros(no_dp))
-      no_parameters += 1
-
-    for index,t in enumerate(self.dc.collected_data):
-      x[index] = t['time']
-
-      for idx, parameter in enumerate(parameters):
-        y[idx][index] = t[parameter]
+    # get the sample times and the columns of the watched properties
+    x = self.dc.get_time()
+    y = [self.dc.get_data(parameter) for parameter in parameters]
 
+    # the lines are decimated to the width of the axes, zooming in decimates them again from all samples
+    def plot_line(ax, index, **settings):
+      line = ax.plot([], [], self.lines[index], linewidth=1, **settings)[0]
+      decimated_line = DecimatedLine(line, x, y[index])
+      decimated_line.redraw(window, pixel_width(ax))
+      ax.update_datalim(line.get_xydata())
+      ax.autoscale_view()
+      if window != None:
+        ax.set_xlim(window)
+      return decimated_line
 
     # determine number of needed plots
     if (combined == False):
@@ -353,111 +424,33 @@ class Interface:
       # fig.tight_layout()
       if (no_parameters > 1):
         for i, ax in enumerate(axs):
-          ax.plot(x, y[i], self.lines[i], linewidth=1)
+          attach_zoom(ax, [plot_line(ax, i)])
           ax.set_title(parameters[i])
           ax.set_ylabel('mmHg')
       else:
-          axs.plot(x, y[0], self.lines[0], linewidth=1)
+          attach_zoom(axs, [plot_line(axs, 0)])
           axs.set_title(parameters[0])
           axs.set_ylabel('mmHg')
     
     if (combined):
       plt.figure( figsize=(18, 5), dpi=300)
+      ax = plt.gca()
+      decimated_lines = []
       for index, parameter in enumerate(parameters):
         # Subplot of figure 1 with id 211 the data (red line r-, first legend = parameter)
-        plt.plot(x, y[index], self.lines[index], linewidth=1, label = parameter)
+        decimated_lines.append(plot_line(ax, index, label = parameter))
         plt.xlabel('time (s)')
         plt.ylabel('mmHg')
         # Add a legend
         plt.legend()
+      attach_zoom(ax, decimated_lines)
 
     plt.show()
-    
-  def find_model_prop(self, prop):
-    # split the model from the prop
-    t  = prop.split(sep=".")
-    if (len(t) == 2):
-      # try to find the parameter in the model
-      if t[0] in self.model.compliances:
-        if (hasattr(self.model.compliances[t[0]], t[1])):
-          return { 'label': prop, 'model': self.model.compliances[t[0]], 'prop': t[1]}
-
-      if t[0] in self.model.time_varying_elastances:
-        if (hasattr(self.model.time_varying_elastances[t[0]], t[1])):
-          return { 'label': prop, 'model': self.model.time_varying_elastances[t[0]], 'prop': t[1]}
-      
-      if t[0] in self.model.resistors:
-        if (hasattr(self.model.resistors[t[0]], t[1])):
-          return { 'label': prop, 'model': self.model.resistors[t[0]], 'prop': t[1]}
-
-      if t[0] in self.model.valves:
-        if (hasattr(self.model.valves[t[0]], t[1])):
-          return { 'label': prop, 'model': self.model.valves[t[0]], 'prop': t[1]}
-
-      if t[0] in self.model.models:
-        if (hasattr(self.model.models[t[0]], t[1])):
-          return { 'label': prop, 'model': self.model.models[t[0]], 'prop': t[1]}
-
-    return None
-    
-class propChange:
-  def __init__(self, prop, new_value, in_time, at_time = 0, update_interval = 0.015):
-
-    self.prop = prop
-    self.current_value = getattr(prop['model'], prop['prop'])
-    self.initial_value = self.current_value
-    self.target_value = new_value
-    self.at_time = at_time
-    self.in_time = in_time
-
-    if (in_time > 0):
-      self.step_size = ((self.target_value - self.current_value) / self.in_time) * update_interval
-    else:
-      self.step_size = 0
 
+  def zoom(self, start, end, sharey = False, combined = True):
+    # draw the time graph of the watched properties between start and end (seconds), decimated from all samples of the run
+    self.draw_time_graph(sharey, combined, (start, end))
     
-    self.update_interval = update_interval
-    self.running = False
-    self.completed = False
-    self.running_time = 0
-  
-  def update (self):
-    if self.completed == False:
-      # check whether the property should start changing (if the at_time has passed)
-      if self.running_time >= self.at_time:
-        if (self.running == False):
-          print(f"- {self.prop['label']} change started at {self.running_time}. Inital value: {self.initial_value}")
-        self.running = True
-      else:
-        self.running = False
-
-      self.running_time += self.update_interval
-
-      if (self.running):
-        self.current_value += self.step_size
-        if abs(self.current_value - self.target_value) < abs(self.step_size):
-          self.current_value = self.target_value
-          self.step_size = 0
-          self.running = False
-          self.completed = True
-          
-        if (self.step_size == 0):
-          self.current_value = self.target_value
-          self.completed = True
-          print(f"- {self.prop['label']} change stopped at {self.running_time}. New value: {self.current_value}")
-
-        setattr(self.prop['model'], self.prop['prop'], self.current_value)
-
-  def cancel (self):
-    self.step_size = 0
-    self.current_value = self.initial_value
-    self.completed = True
-    setattr(self.prop['model'], self.prop['prop'], self.current_value)
-
-  def complete (self):
-    self.step_size = 0
-    self.current_value = self.target_value
-    self.completed = True
-    setattr(self.prop['model'], self.prop['prop'], self.current_value)
-
-  
\ No newline at end of file
+  def find_model_prop(self, prop):
+    # look up the property in the property index of the model
+    return self.model.properties.find(prop)
@@ -0,0 +1,138 @@
+import asyncio
+from time import perf_counter
+
+class RealtimeRunner:
+  # runs the model locked to the wall clock in small chunks and hands the watched samples to an async consumer
+  def __init__(self, model, realtime_factor = 1.0, chunk_duration = 0.02, max_queued_blocks = 16, drop_when_full = False, keep_data = False, max_lag = 0.1, on_behind = None):
+    # store a reference to the model
+    self.model = model
+
+    # model seconds per wall clock second
+    self.realtime_factor = realtime_factor
+
+    # the model time calculated at once, the event loop is blocked while a chunk is calculated
+    self.chunk_steps = max(int(round(chunk_duration / model.modeling_stepsize)), 1)
+
+    # the sample blocks waiting for the consumer, when the queue is full the runner waits for the consumer (backpressure) or drops the oldest block
+    self.max_queued_blocks = max_queued_blocks
+    self.drop_when_full = drop_when_full
+
+    # keep the samples in the datacollector as well (memory grows with the run) or only hand them to the consumer
+    self.keep_data = keep_data
+
+    # the model is behind when it lags the wall clock more than max_lag seconds, on_behind(lag) is called when that happens
+    self.max_lag = max_lag
+    self.on_behind = on_behind
+
+    # state of the run
+    self.running = False
+    self.behind = False
+    self.lag = 0.0
+    self.max_lag_observed = 0.0
+    self.no_late_chunks = 0
+    self.no_dropped_blocks = 0
+    self._stop = False
+    self._first_sample = 0
+
+  def stop(self):
+    # stop after the chunk which is being calculated
+    self._stop = True
+
+  async def stream(self, duration = None):
+    # async iterator of sample blocks, runs until the duration (model seconds) has passed, stop() is called or the consumer stops iterating
+    queue = asyncio.Queue(maxsize=self.max_queued_blocks)
+    producer = asyncio.ensure_future(self.produce(queue, duration))
+    try:
+      while True:
+        block = await queue.get()
+        if block is None:
+          break
+        yield block
+      # raise the errors of the run
+      await producer
+    finally:
+      if not producer.done():
+        producer.cancel()
+
+  def __aiter__(self):
+    return self.stream()
+
+  async def produce(self, queue, duration):
+    model = self.model
+    t = model.modeling_stepsize
+    total_steps = None if duration == None else int(round(duration / t))
+
+    self._stop = False
+    self.running = True
+    self._first_sample = model.io.dc.no_samples
+
+    steps_done = 0
+    start_wall = perf_counter()
+    try:
+      while not self._stop and (total_steps == None or steps_done < total_steps):
+        steps = self.chunk_steps if total_steps == None else min(self.chunk_steps, total_steps - steps_done)
+
+        model.calculate_steps(steps)
+        steps_done += steps
+
+        # the wall clock time at which this chunk should have been ready
+        target = start_wall + steps_done * t / self.realtime_factor
+        self.check_lag(perf_counter() - target)
+
+        block = self.take_block()
+        if block != None:
+          await self.put(queue, block)
+
+        # hold the real-time factor, a model which is behind catches up without sleeping
+        await asyncio.sleep(max(target - perf_counter(), 0))
+    except asyncio.CancelledError:
+      raise
+    except Exception:
+      # wake up the consumer, the error is raised when it awaits the producer
+      await queue.put(None)
+      raise
+    finally:
+      self.running = False
+
+    await queue.put(None)
+
+  def check_lag(self, lag):
+    self.lag = lag
+    self.max_lag_observed = max(self.max_lag_observed, lag)
+    if lag > self.max_lag:
+      self.no_late_chunks += 1
+      if not self.behind:
+        self.behind = True
+        print(f'- model is {round(lag, 3)} sec. behind real time at {round(self.model.model_clock, 3)} sec.')
+        if self.on_behind != None:
+          self.on_behind(lag)
+    elif self.behind and lag <= 0:
+      self.behind = False
+      print(f'- model caught up with real time at {round(self.model.model_clock, 3)} sec.')
+
+  def take_block(self):
+    # collect the samples of the last chunk
+    dc = self.model.io.dc
+    samples = dc.get_block(self._first_sample)
+    if samples.shape[1] == 0:
+      return None
+
+    # a recorder keeps the samples in its file when they are dropped, so the next block always starts after the samples taken so far
+    if not self.keep_data:
+      dc.drop_samples()
+    self._first_sample = dc.no_samples
+
+    labels = [parameter['label'] for parameter in dc.watch_list]
+    return {
+      'time': samples[0],
+      'data': {label: samples[index + 1] for index, label in enumerate(labels)},
+      'model_clock': self.model.model_clock,
+      'lag': self.lag
+    }
+
+  async def put(self, queue, block):
+    if self.drop_when_full and queue.full():
+      # drop the oldest block, the consumer gets the most recent samples
+      queue.get_nowait()
+      self.no_dropped_blocks += 1
+    await queue.put(block)
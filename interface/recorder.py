@@ -0,0 +1,189 @@
+import json
+import queue
+import struct
+import threading
+import numpy as np
+
+from interface.datacollector import Datacollector
+
+# the recording file starts with a magic string and the length of a json header, followed by the samples as rows of float64 values
+MAGIC = b'EXPLREC1'
+HEADER_ALIGNMENT = 64
+
+def write_header(file, labels, sample_interval, modeling_stepsize):
+  header = json.dumps({
+    'version': 1,
+    'dtype': '<f8',
+    'labels': labels,
+    'sample_interval': sample_interval,
+    'modeling_stepsize': modeling_stepsize
+  }).encode('utf-8')
+
+  # pad the header so the samples start at an aligned offset
+  header_size = len(MAGIC) + 4 + len(header)
+  header += b' ' * (-header_size % HEADER_ALIGNMENT)
+
+  file.write(MAGIC)
+  file.write(struct.pack('<I', len(header)))
+  file.write(header)
+
+
+class Recording:
+  # reader which opens a recording file lazily, the samples are memory mapped and only read when sliced
+  def __init__(self, path):
+    self.path = path
+
+    with open(path, 'rb') as file:
+      if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f'{path} is not a recording file')
+      header_length = struct.unpack('<I', file.read(4))[0]
+      self.header = json.loads(file.read(header_length).decode('utf-8'))
+      self._offset = file.tell()
+      file.seek(0, 2)
+      file_size = file.tell()
+
+    self.labels = self.header['labels']
+    self.sample_interval = self.header['sample_interval']
+
+    # the number of complete samples in the file
+    row_size = len(self.labels) * 8
+    self.no_samples = (file_size - self._offset) // row_size
+
+    if self.no_samples > 0:
+      self._samples = np.memmap(path, dtype=self.header['dtype'], mode='r', offset=self._offset, shape=(self.no_samples, len(self.labels)))
+    else:
+      self._samples = np.zeros((0, len(self.labels)))
+
+  def get_time(self):
+    return self._samples[:, 0]
+
+  def get_data(self, label):
+    # return a (lazy) view on the samples of a property
+    if label not in self.labels:
+      return None
+    return self._samples[:, self.labels.index(label)]
+
+  def window(self, t_start, t_end, labels = None):
+    # find the samples within the time window, the time column is sorted so a binary search only touches a few pages
+    time = self.get_time()
+    first = int(np.searchsorted(time, t_start, side='left'))
+    last = int(np.searchsorted(time, t_end, side='right'))
+
+    if labels == None:
+      labels = self.labels
+
+    # copy the samples of the window into memory
+    return {label: np.array(self._samples[first:last, self.labels.index(label)]) for label in labels if label in self.labels}
+
+
+class StreamingRecorder(Datacollector):
+  # datacollector which writes the samples in fixed size chunks to a recording file from a background thread
+  def __init__(self, model, path, chunk_size = 8192, max_queued_chunks = 4):
+    # store the recording settings before the datacollector builds the watch list
+    self.path = path
+    self.chunk_size = chunk_size
+    self._queue = queue.Queue(maxsize=max_queued_chunks)
+    self._writer = None
+    self._file = None
+    self._reader = None
+
+    # initialize the datacollector
+    super().__init__(model)
+
+  def clear_data(self):
+    # the columns changed, a recording which was started is closed and the file is started again at the next sample
+    self.close()
+
+    # the chunk which is being filled
+    self._chunk = np.zeros((self.chunk_size, len(self.watch_list) + 1))
+    self._chunk_samples = 0
+    self.no_samples = 0
+    self._step_counter = 0
+    self._reader = None
+
+  def start(self):
+    # create the recording file with the current watch list and start the background writer, once per recording
+    self._file = open(self.path, 'wb')
+    labels = ['time'] + [parameter['label'] for parameter in self.watch_list]
+    write_header(self._file, labels, self.sample_interval, self.modeling_stepsize)
+    self._file.flush()
+
+    self._writer = threading.Thread(target=self.write_chunks, args=(self._file, self._queue), daemon=True)
+    self._writer.start()
+
+  def write_chunks(self, file, chunks):
+    # write the chunks in the order they were queued, None stops the writer
+    while True:
+      chunk = chunks.get()
+      if chunk is None:
+        chunks.task_done()
+        break
+      file.write(chunk.tobytes())
+      chunks.task_done()
+
+  def reserve(self, no_steps):
+    # the recorder uses a fixed amount of memory whatever the length of the run
+    pass
+
+  def store_sample(self, model_clock, values):
+    if self._writer is None:
+      self.start()
+
+    self._chunk[self._chunk_samples, 0] = model_clock
+    self._chunk[self._chunk_samples, 1:] = values
+    self._chunk_samples += 1
+    self.no_samples += 1
+    self._reader = None
+
+    # hand a full chunk to the writer, this blocks when the writer falls behind so the memory use stays bounded
+    if self._chunk_samples == self.chunk_size:
+      self._queue.put(self._chunk)
+      self._chunk = np.zeros_like(self._chunk)
+      self._chunk_samples = 0
+
+  def flush(self):
+    # write the partially filled chunk and wait until everything is on disk
+    if self._writer is None:
+      return
+    if self._chunk_samples > 0:
+      self._queue.put(self._chunk[:self._chunk_samples].copy())
+      self._chunk_samples = 0
+    self._queue.join()
+    self._file.flush()
+
+  def close(self):
+    # write the samples which are left, stop the writer and close the file
+    if self._writer is None:
+      return
+    self.flush()
+    self._queue.put(None)
+    self._writer.join()
+    self._file.close()
+    self._writer = None
+    self._file = None
+
+  def open(self):
+    # open the recording for reading, a recording without samples holds only the header
+    if self._reader is None:
+      if self._writer is None:
+        self.start()
+      self.flush()
+      self._reader = Recording(self.path)
+    return self._reader
+
+  def get_block(self, start = 0):
+    # the samples of the recording file from sample number start onwards, the first row holds the sample times
+    return np.array(self.open()._samples[start:]).T
+
+  def drop_samples(self):
+    # the samples stay in the recording file
+    pass
+
+  def get_time(self):
+    return self.open().get_time()
+
+  def get_data(self, label):
+    return self.open().get_data(label)
+
+  def window(self, t_start, t_end, labels = None):
+    return self.open().window(t_start, t_end, labels)
@@ -0,0 +1,159 @@
+import heapq
+import itertools
+import math
+
+class propChange:
+  def __init__(self, prop, new_value, start_tick, end_tick, modeling_stepsize):
+    # store the property reference (from the property index) and the target value
+    self.prop = prop
+    self.target_value = new_value
+    self.initial_value = prop['get']()
+    self.current_value = self.initial_value
+
+    # the change starts and ends at exact model steps
+    self.start_tick = start_tick
+    self.end_tick = end_tick
+    self._t = modeling_stepsize
+
+    self.running = False
+    self.completed = False
+
+  def start(self, tick):
+    # the change runs from the value the property has when it starts
+    self.initial_value = self.prop['get']()
+    self.current_value = self.initial_value
+    self.running = True
+    print(f"- {self.prop['label']} change started at {round(tick * self._t, 5)}. Inital value: {self.initial_value}")
+
+  def update(self, tick):
+    # ramp linearly from the initial value to the target value
+    if self.running and self.end_tick > self.start_tick:
+      fraction = (tick - self.start_tick) / (self.end_tick - self.start_tick)
+      self.current_value = self.initial_value + fraction * (self.target_value - self.initial_value)
+      self.prop['set'](self.current_value)
+
+  def stop(self, tick):
+    self.complete()
+    print(f"- {self.prop['label']} change stopped at {round(tick * self._t, 5)}. New value: {self.current_value}")
+
+  def cancel (self):
+    self.current_value = self.initial_value
+    self.running = False
+    self.completed = True
+    self.prop['set'](self.current_value)
+
+  def complete (self):
+    self.current_value = self.target_value
+    self.running = False
+    self.completed = True
+    self.prop['set'](self.current_value)
+
+
+class Scheduler:
+  def __init__(self, modeling_stepsize, update_interval = 0.015):
+    # get the modeling stepsize
+    self._t = modeling_stepsize
+
+    # the running changes are updated every update_ticks model steps
+    self.update_interval = update_interval
+    self.update_ticks = max(int(round(update_interval / modeling_stepsize)), 1)
+
+    # number of model steps processed by the scheduler
+    self.tick = 0
+
+    # priority queue of (tick, sequence number, event, change) with the start and end events of the changes
+    self._events = []
+    self._sequence = itertools.count()
+
+    # list of the changes which are running
+    self.active = []
+
+    # the model step at which the scheduler has something to do
+    self._next_update = math.inf
+    self._next_tick = math.inf
+
+  def schedule(self, prop, new_value, in_time, at_time = 0):
+    # convert the times to model steps counted from the current model step
+    start_tick = self.tick + int(round(at_time / self._t))
+    end_tick = start_tick + int(round(in_time / self._t))
+
+    change = propChange(prop, new_value, start_tick, end_tick, self._t)
+    self.push(start_tick, 'start', change)
+
+    return change
+
+  def push(self, tick, event, change):
+    heapq.heappush(self._events, (tick, next(self._sequence), event, change))
+    self._next_tick = min(self._next_tick, tick)
+
+  def step(self):
+    # called once every model step, costs nothing when no change is pending
+    tick = self.tick
+    self.tick += 1
+    if tick >= self._next_tick:
+      self.process(tick)
+
+  def process(self, tick):
+    # handle the start and end events which are due
+    while self._events and self._events[0][0] <= tick:
+      _, _, event, change = heapq.heappop(self._events)
+      if change.completed:
+        continue
+      if event == 'start':
+        change.start(tick)
+        if change.end_tick <= tick:
+          # a step change is applied at once
+          change.stop(tick)
+        else:
+          self.active.append(change)
+          self.push(change.end_tick, 'end', change)
+          self._next_update = min(self._next_update, tick + self.update_ticks)
+      else:
+        change.stop(tick)
+
+    # update the running ramps
+    self.active = [change for change in self.active if not change.completed]
+    if self.active:
+      if tick >= self._next_update:
+        for change in self.active:
+          change.update(tick)
+        self._next_update = tick + self.update_ticks
+    else:
+      self._next_update = math.inf
+
+    # determine when the scheduler has to do something again
+    self._next_tick = min(self._events[0][0] if self._events else math.inf, self._next_update)
+
+  def pending(self):
+    # return the changes which are scheduled or running
+    changes = [change for _, _, event, change in self._events if event == 'start' and not change.completed]
+    return self.active + changes
+
+  def cancel_all(self):
+    for change in self.pending():
+      change.cancel()
+    self.clear()
+
+  def clear(self):
+    # drop all changes without touching the properties
+    self._events = []
+    self.active = []
+    self._next_update = math.inf
+    self._next_tick = math.inf
+
+  def restore(self, prop, saved):
+    # rebuild a change from its saved state (see engine.checkpoint)
+    change = propChange(prop, saved['target_value'], saved['start_tick'], saved['end_tick'], self._t)
+    change.initial_value = saved['initial_value']
+    change.current_value = prop['get']()
+
+    if saved['running']:
+      change.running = True
+      self.active.append(change)
+      self.push(change.end_tick, 'end', change)
+      self._next_update = min(self._next_update, self.tick)
+      self._next_tick = min(self._next_tick, self._next_update)
+    else:
+      self.push(change.start_tick, 'start', change)
+
+    return change
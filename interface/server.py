@@ -0,0 +1,286 @@
+import asyncio
+import json
+import math
+import struct
+from collections import deque
+import numpy as np
+
+from interface.realtime import RealtimeRunner
+
+# every frame starts with the number of bytes which follow and the frame type
+FRAME_HEADER = struct.Struct('<IB')
+# a samples frame holds the number of the first sample, the number of samples and the number of columns followed by the samples as float64 (time first, then the properties in the order of the subscription)
+SAMPLES_HEADER = struct.Struct('<QII')
+FRAME_SAMPLES = 1
+# a reply frame holds a utf-8 json message
+FRAME_REPLY = 2
+
+
+def pack_reply(message):
+  body = json.dumps(message).encode('utf-8')
+  return FRAME_HEADER.pack(len(body) + 1, FRAME_REPLY) + body
+
+def pack_samples(sequence, samples):
+  body = SAMPLES_HEADER.pack(sequence, samples.shape[0], samples.shape[1]) + np.ascontiguousarray(samples, dtype='<f8').tobytes()
+  return FRAME_HEADER.pack(len(body) + 1, FRAME_SAMPLES) + body
+
+def is_number(value):
+  # a json number, true and false are not accepted as numbers
+  return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+async def read_frame(reader):
+  # read a frame sent by the server, returns ('samples', (sequence, samples)) or ('reply', message)
+  size, frame_type = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+  body = await reader.readexactly(size - 1)
+  if frame_type == FRAME_SAMPLES:
+    sequence, no_samples, no_columns = SAMPLES_HEADER.unpack_from(body)
+    samples = np.frombuffer(body, dtype='<f8', offset=SAMPLES_HEADER.size).reshape(no_samples, no_columns)
+    return 'samples', (sequence, samples)
+  return 'reply', json.loads(body)
+
+
+class StreamClient:
+  # a connected client with its subscription and its queue of sample blocks
+  def __init__(self, server, reader, writer, max_queued_frames, policy):
+    self.server = server
+    self.reader = reader
+    self.writer = writer
+
+    # the labels of the subscribed properties and the number of model steps between the samples of this client
+    self.labels = []
+    self.ticks = 1
+
+    # every how many collected samples this client gets a sample and how many samples to skip before the next one
+    self.every = 1
+    self.phase = 0
+    # number of samples sent to this client, the sequence number of a frame is the number of its first sample
+    self.sequence = 0
+
+    # the sample blocks waiting to be written, a slow client drops the oldest blocks or coalesces them into the latest sample
+    self.queue = deque()
+    self.replies = deque()
+    self.max_queued_frames = max_queued_frames
+    self.policy = policy
+    self.no_dropped_samples = 0
+    self.wakeup = asyncio.Event()
+
+  def publish(self, time, data):
+    # the blocks which were queued before the subscription changed don't hold the new properties, these are skipped
+    for label in self.labels:
+      if label not in data:
+        return
+
+    # pick the samples of this client from the collected samples
+    no_samples = len(time)
+    indices = np.arange(self.phase, no_samples, self.every)
+    self.phase = self.phase + len(indices) * self.every - no_samples
+    if len(indices) == 0:
+      return
+
+    samples = np.empty((len(indices), len(self.labels) + 1))
+    samples[:, 0] = time[indices]
+    for column, label in enumerate(self.labels):
+      samples[:, column + 1] = data[label][indices]
+
+    if len(self.queue) >= self.max_queued_frames:
+      if self.policy == 'coalesce':
+        # only the latest sample is sent, the client sees a gap in the sequence numbers
+        self.no_dropped_samples += sum(len(block) for _, block in self.queue) + len(samples) - 1
+        self.queue.clear()
+        self.sequence += len(samples) - 1
+        samples = samples[-1:]
+      else:
+        _, block = self.queue.popleft()
+        self.no_dropped_samples += len(block)
+
+    self.queue.append((self.sequence, samples))
+    self.sequence += len(samples)
+    self.wakeup.set()
+
+  def reply(self, message):
+    self.replies.append(message)
+    self.wakeup.set()
+
+  async def write(self):
+    # write the queued frames, waiting for a slow client only holds up this client
+    while True:
+      await self.wakeup.wait()
+      self.wakeup.clear()
+      while self.replies or self.queue:
+        if self.replies:
+          self.writer.write(pack_reply(self.replies.popleft()))
+        else:
+          sequence, samples = self.queue.popleft()
+          self.writer.write(pack_samples(sequence, samples))
+        await self.writer.drain()
+
+  async def read(self):
+    # the commands are json messages, one per line
+    while True:
+      line = await self.reader.readline()
+      if not line:
+        return
+      try:
+        command = json.loads(line)
+      except ValueError:
+        self.reply({'error': 'invalid json'})
+        continue
+      if not isinstance(command, dict):
+        self.reply({'error': 'a command must be a json object'})
+        continue
+      self.reply(self.server.execute(self, command))
+
+
+class StreamServer:
+  # runs the model in real time and streams the properties subscribed by the clients over a tcp or unix socket
+  def __init__(self, model, host = '127.0.0.1', port = 5750, path = None, realtime_factor = 1.0, max_queued_frames = 64, policy = 'drop', **settings):
+    # store a reference to the model
+    self.model = model
+
+    # the address of the server, a unix socket is used when a path is given
+    self.host = host
+    self.port = port
+    self.path = path
+
+    # the default queue of a client, a client can choose its own policy (drop or coalesce) when it subscribes
+    self.max_queued_frames = max_queued_frames
+    self.policy = policy
+
+    # the model runs in chunks locked to the wall clock, the samples are only kept until they are sent
+    self.runner = RealtimeRunner(model, realtime_factor, keep_data=False, **settings)
+
+    self.clients = []
+    self.server = None
+
+  def stop(self):
+    self.runner.stop()
+
+  async def serve(self, duration = None):
+    # accept clients and run the model until the duration (model seconds) has passed or stop() is called
+    if self.path != None:
+      self.server = await asyncio.start_unix_server(self.handle_client, path=self.path)
+      print(f'Streaming model signals on {self.path}.')
+    else:
+      self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+      self.port = self.server.sockets[0].getsockname()[1]
+      print(f'Streaming model signals on {self.host}:{self.port}.')
+
+    try:
+      async for block in self.runner.stream(duration):
+        for client in list(self.clients):
+          if client.labels:
+            try:
+              client.publish(block['time'], block['data'])
+            except Exception as error:
+              # a client which fails is disconnected, the other clients keep streaming
+              print(f'- streaming to a client failed: {error!r}')
+              client.writer.close()
+    finally:
+      self.server.close()
+      for client in list(self.clients):
+        client.writer.close()
+      await self.server.wait_closed()
+
+  async def handle_client(self, reader, writer):
+    client = StreamClient(self, reader, writer, self.max_queued_frames, self.policy)
+    self.clients.append(client)
+    write_task = asyncio.ensure_future(client.write())
+    try:
+      await client.read()
+    except (ConnectionError, asyncio.IncompleteReadError):
+      pass
+    finally:
+      write_task.cancel()
+      self.clients.remove(client)
+      self.update_watchlist()
+      writer.close()
+
+  def execute(self, client, command):
+    # handle a command of a client and return the reply
+    name = command.get('command')
+    if name == 'subscribe':
+      return self.subscribe(client, command.get('props', []), command.get('interval', self.model.io.dc.sample_interval), command.get('policy', client.policy))
+    if name == 'unsubscribe':
+      client.labels = []
+      self.update_watchlist()
+      return {'command': name, 'ok': True}
+    if name in ('prop_change', 'schedule_prop_change'):
+      return self.change(name, command)
+    return {'command': name, 'error': f'unknown command {name}'}
+
+  def subscribe(self, client, labels, interval, policy):
+    # the command comes from a client, so the types are checked before anything is changed
+    if not isinstance(labels, list) or not all(isinstance(label, str) for label in labels):
+      return {'command': 'subscribe', 'error': 'props must be a list of property names'}
+    if not is_number(interval) or interval <= 0:
+      return {'command': 'subscribe', 'error': 'interval must be a positive number'}
+    for label in labels:
+      if self.model.io.find_model_prop(label) == None:
+        return {'command': 'subscribe', 'error': f'property {label} not found in model'}
+    if not isinstance(policy, str) or policy not in ('drop', 'coalesce'):
+      return {'command': 'subscribe', 'error': f'unknown policy {policy}'}
+
+    client.labels = list(labels)
+    client.ticks = max(int(round(interval / self.model.modeling_stepsize)), 1)
+    client.policy = policy
+    self.update_watchlist()
+    return {'command': 'subscribe', 'ok': True, 'props': client.labels, 'interval': client.ticks * self.model.modeling_stepsize}
+
+  def update_watchlist(self):
+    # the datacollector samples every subscribed property once, at the greatest common interval of the subscriptions
+    dc = self.model.io.dc
+    subscribed = [client for client in self.clients if client.labels]
+    labels = list(dict.fromkeys(label for client in subscribed for label in client.labels))
+
+    ticks = 0
+    for client in subscribed:
+      ticks = math.gcd(ticks, client.ticks)
+    ticks = max(ticks, 1)
+
+    dc.clear_watchlist()
+    dc.set_sample_interval(ticks * self.model.modeling_stepsize)
+    for label in labels:
+      dc.add_to_watchlist(self.model.io.find_model_prop(label))
+
+    for client in subscribed:
+      client.every = client.ticks // ticks
+      client.phase = 0
+
+  def change(self, name, command):
+    io = self.model.io
+    if not isinstance(command.get('prop'), str):
+      return {'command': name, 'error': 'prop must be a property name'}
+    for key in ['in_time', 'at_time']:
+      if not is_number(command.get(key, 0)) or command.get(key, 0) < 0:
+        return {'command': name, 'error': f'{key} must be a number of at least 0'}
+    prop = io.find_model_prop(command.get('prop'))
+    if prop == None:
+      return {'command': name, 'error': f"property {command.get('prop')} not found in model"}
+    if not io.type_matches(prop['get'](), command.get('value')):
+      return {'command': name, 'error': f"property type mismatch, model property type = {type(prop['get']()).__name__}"}
+
+    if name == 'prop_change':
+      io.prop_change(prop['label'], command['value'])
+    else:
+      io.schedule_prop_change(prop['label'], command['value'], command.get('in_time', 0), command.get('at_time', 0))
+    return {'command': name, 'ok': True}
+
+
+if __name__ == '__main__':
+  import argparse
+  from explain import Model
+
+  parser = argparse.ArgumentParser(description='stream the signals of a model to local clients')
+  parser.add_argument('--definition', default='./definitions/normal_neonate_24h.json')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=5750)
+  parser.add_argument('--path', default=None, help='unix socket path, used instead of the tcp port')
+  parser.add_argument('--realtime-factor', type=float, default=1.0)
+  parser.add_argument('--duration', type=float, default=None, help='model seconds to run, runs until interrupted by default')
+  args = parser.parse_args()
+
+  server = StreamServer(Model(args.definition), args.host, args.port, args.path, args.realtime_factor)
+  try:
+    asyncio.run(server.serve(args.duration))
+  except KeyboardInterrupt:
+    pass
@@ -0,0 +1,166 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from explain import Model
+from interface.analysis import beat_starts
+
+# the model instance of a worker process, which is reused between the jobs
+_worker_model = None
+
+def _init_worker(model_definition_file):
+  global _worker_model
+  # build the model once, it is reused for all jobs of this worker process
+  _worker_model = Model(model_definition_file)
+
+def _run_job(job):
+  # run a single parameter set on the model of this worker process
+  return run_parameter_set(_worker_model, *job)
+
+def run_parameter_set(model, parameters, duration, warm_up, metrics, sample_interval):
+  # reset the model to the state of the definition which was loaded when the worker started
+  model.initialize(model.model_definition)
+  model.model_clock = 0
+
+  # apply the parameter values
+  for prop, value in parameters.items():
+    model.properties.set(prop, value)
+
+  # let the model settle before recording
+  if warm_up > 0:
+    model.calculate(warm_up)
+
+  # watch the metric properties
+  model.io.dc.clear_watchlist()
+  model.io.dc.set_sample_interval(sample_interval)
+  for prop in metrics:
+    model.io.dc.add_to_watchlist(model.io.find_model_prop(prop))
+
+  # calculate the model steps
+  model.calculate(duration)
+
+  return summarize(model.io.dc, metrics)
+
+def is_number(value):
+  # booleans are integers in python, but a switch like is_enabled has to stay a boolean
+  return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+def summarize(dc, metrics):
+  # calculate the summary metrics which Interface.analyze prints
+  time = dc.get_time()
+  ncc_ventricular = dc.get_data('ecg.ncc_ventricular')
+  duration = time[-1] - time[0] if len(time) > 1 else 0
+
+  # a heartbeat starts every time the ventricular activation counter is reset
+  heartbeats = len(beat_starts(ncc_ventricular))
+
+  summary = {'heart_rate': (heartbeats / duration) * 60 if duration > 0 else np.nan}
+
+  for prop in metrics:
+    data = dc.get_data(prop)
+    prop_category = prop.split(sep=".")[1]
+
+    if prop_category == "flow":
+      # the mean flow in l/sec converted to l/min
+      flow = np.mean(data) * 60
+      summary[prop + '.flow'] = flow
+      summary[prop + '.stroke_volume'] = flow / summary['heart_rate'] * 1000 if heartbeats > 0 else np.nan
+    else:
+      summary[prop + '.max'] = np.amax(data)
+      summary[prop + '.min'] = np.amin(data)
+      summary[prop + '.mean'] = np.mean(data)
+
+  return summary
+
+
+class Sweep:
+  def __init__(self, model_definition_file = './definitions/normal_neonate_24h.json', duration = 10, metrics = (), warm_up = 0, sample_interval = 0.0005, processes = None):
+    # store the base definition file
+    self.model_definition_file = model_definition_file
+
+    # store the run settings
+    self.duration = duration
+    self.warm_up = warm_up
+    self.sample_interval = sample_interval
+
+    # store the properties of which the summary metrics are calculated
+    if isinstance(metrics, str):
+      metrics = [metrics]
+    self.metrics = list(metrics)
+
+    # number of worker processes (None = number of cpu's, 1 = run in this process)
+    self.processes = processes if processes != None else os.cpu_count()
+
+  def grid(self, parameters):
+    # run every combination of the parameter values, e.g. {'LV.el_max': [10000, 12500], 'ecg.heart_rate': [100, 140]}
+    names = list(parameters.keys())
+    combinations = list(itertools.product(*[parameters[name] for name in names]))
+    # switches (booleans) and other non numeric values keep their type
+    numeric = all(is_number(value) for combination in combinations for value in combination)
+    samples = np.array(combinations, dtype=float if numeric else object)
+    return self.run(names, samples)
+
+  def random(self, parameters, no_samples, seed = None):
+    # run uniform random samples within the parameter ranges, e.g. {'LV.el_max': (10000, 15000)}
+    names = list(parameters.keys())
+    low, high = self.bounds(parameters, names)
+    rng = np.random.default_rng(seed)
+    samples = low + rng.random((no_samples, len(names))) * (high - low)
+    return self.run(names, samples)
+
+  def latin_hypercube(self, parameters, no_samples, seed = None):
+    # run a latin hypercube sample within the parameter ranges, so every range is divided in no_samples strata which are all sampled once
+    names = list(parameters.keys())
+    low, high = self.bounds(parameters, names)
+    rng = np.random.default_rng(seed)
+    strata = np.column_stack([rng.permutation(no_samples) for _ in names])
+    unit = (strata + rng.random((no_samples, len(names)))) / no_samples
+    samples = low + unit * (high - low)
+    return self.run(names, samples)
+
+  def bounds(self, parameters, names):
+    low = np.array([parameters[name][0] for name in names], dtype=float)
+    high = np.array([parameters[name][1] for name in names], dtype=float)
+    return low, high
+
+  def validate(self, names):
+    # check whether all parameters and metrics can be found in the model before fanning out the jobs
+    io = Model(self.model_definition_file).io
+    valid = True
+    for prop in names + self.metrics:
+      if io.find_model_prop(prop) == None:
+        print(f"{prop} not found in model")
+        valid = False
+    return valid
+
+  def run(self, names, samples):
+    if not self.validate(names):
+      return None
+
+    # build the jobs
+    jobs = []
+    for sample in samples:
+      parameters = {name: float(value) if is_number(value) else value for name, value in zip(names, sample)}
+      jobs.append((parameters, self.duration, self.warm_up, self.metrics, self.sample_interval))
+
+    print(f'Running {len(jobs)} parameter sets of {self.duration} sec. on {self.processes} processes.')
+
+    if self.processes == 1:
+      # run all jobs on a single model in this process
+      _init_worker(self.model_definition_file)
+      summaries = [_run_job(job) for job in jobs]
+    else:
+      # fan the jobs out over the process pool, every worker builds its model once
+      with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker, initargs=(self.model_definition_file,)) as executor:
+        chunksize = max(len(jobs) // (self.processes * 4), 1)
+        summaries = list(executor.map(_run_job, jobs, chunksize=chunksize))
+
+    # return the parameter values and the summary metrics of all runs as arrays
+    results = {}
+    for index, name in enumerate(names):
+      results[name] = samples[:, index]
+    for key in summaries[0] if summaries else []:
+      results[key] = np.array([summary[key] for summary in summaries])
+
+    return results
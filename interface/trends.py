@@ -0,0 +1,174 @@
+from collections import deque
+import numpy as np
+
+from interface.datacollector import Datacollector
+
+class TrendCollector:
+  # accumulates per beat statistics of properties while the model runs, so long runs don't need the raw samples
+  # the samples are due at the same model steps as the samples of the datacollector (see Interface.collect_data)
+  sample_due = Datacollector.sample_due
+
+  def __init__(self, model, properties, sample_interval = 0.005, trend_interval = None, on_record = None, max_records = 10000):
+    # store a reference to the model
+    self.model = model
+
+    # the beats are detected at the reset of the ventricular activation counter of the ecg model, which is read as the first value of every sample
+    self.watch_list = [model.properties.find('ecg.ncc_ventricular')]
+
+    # the watched properties and their accessors
+    self.labels = []
+    for label in properties:
+      reference = model.properties.find(label)
+      if reference == None:
+        print(f'{label} not found in model, no trend is collected')
+        continue
+      self.labels.append(label)
+      self.watch_list.append(reference)
+    self.kinds = [label.split(sep=".")[-1] for label in self.labels]
+    self._accessors = [reference['get'] for reference in self.watch_list]
+
+    # a sample is taken every _sample_steps model steps
+    self._sample_steps = max(int(round(sample_interval / model.modeling_stepsize)), 1)
+    self.sample_interval = self._sample_steps * model.modeling_stepsize
+    self._step_counter = 0
+
+    # per beat records are emitted, or the averages of the beats per trend interval (seconds) when a trend interval is set
+    # without a callback the last max_records records are kept (None keeps all of them)
+    self.trend_interval = trend_interval
+    self.on_record = on_record
+    self.records = deque(maxlen=max_records)
+
+    # accumulators of the beat which is running
+    n = len(self.labels)
+    self._sum = np.zeros(n)
+    self._min = np.full(n, np.inf)
+    self._max = np.full(n, -np.inf)
+    self._start = np.zeros(n)
+    self._count = 0
+    self._beat_time = None
+    self._previous_ncc = None
+
+    # accumulators of the trend interval which is running
+    self._interval_sum = None
+    self._interval_beats = 0
+    self._interval_time = None
+
+    # running totals of every per beat value over the whole run (count, sum, sum of squares, min and max)
+    self.totals = {}
+
+  def read_values(self):
+    # read the ventricular activation counter and the current values of the properties
+    return [accessor() for accessor in self._accessors]
+
+  def store_sample(self, model_clock, values):
+    ncc = values[0]
+    values = np.array(values[1:], dtype=float)
+
+    # a new beat starts when the ventricular activation counter was reset since the previous sample
+    if self._previous_ncc != None and ncc < self._previous_ncc:
+      if self._beat_time != None:
+        self.close_beat()
+      self._beat_time = model_clock
+      self._count = 0
+      self._sum[:] = 0
+      self._min[:] = np.inf
+      self._max[:] = -np.inf
+      self._start[:] = values
+    self._previous_ncc = ncc
+
+    if self._beat_time != None:
+      self._count += 1
+      self._sum += values
+      np.minimum(self._min, values, out=self._min)
+      np.maximum(self._max, values, out=self._max)
+
+  def close_beat(self):
+    duration = self._count * self.sample_interval
+    record = {'time': self._beat_time, 'duration': duration, 'heart_rate': 60.0 / duration}
+
+    for index, label in enumerate(self.labels):
+      kind = self.kinds[index]
+      minimum, maximum = self._min[index], self._max[index]
+      mean = self._sum[index] / self._count
+
+      if kind == 'pres':
+        record[label + '.systolic'] = maximum
+        record[label + '.diastolic'] = minimum
+        record[label + '.mean'] = mean
+      elif kind == 'vol':
+        # the beat starts at the ventricular trigger, which is end-diastole
+        record[label + '.end_diastolic'] = self._start[index]
+        record[label + '.end_systolic'] = minimum
+        record[label + '.stroke_volume'] = maximum - minimum
+      elif kind == 'flow':
+        stroke_volume = self._sum[index] * self.sample_interval
+        record[label + '.stroke_volume'] = stroke_volume
+        record[label + '.cardiac_output'] = stroke_volume / duration * 60
+      else:
+        record[label + '.max'] = maximum
+        record[label + '.min'] = minimum
+        record[label + '.mean'] = mean
+
+    self.add_to_totals(record)
+
+    if self.trend_interval == None:
+      self.emit(record)
+    else:
+      self.add_to_interval(record)
+
+  def add_to_totals(self, record):
+    for key, value in record.items():
+      if key == 'time':
+        continue
+      total = self.totals.get(key)
+      if total == None:
+        self.totals[key] = [1, value, value * value, value, value]
+      else:
+        total[0] += 1
+        total[1] += value
+        total[2] += value * value
+        total[3] = min(total[3], value)
+        total[4] = max(total[4], value)
+
+  def add_to_interval(self, record):
+    # emit the averages of the beats of the interval when the beat starts after the end of the interval
+    if self._interval_time != None and record['time'] >= self._interval_time + self.trend_interval:
+      self.flush()
+
+    if self._interval_time == None:
+      self._interval_time = record['time']
+      self._interval_sum = {key: 0.0 for key in record if key != 'time'}
+      self._interval_beats = 0
+
+    for key in self._interval_sum:
+      self._interval_sum[key] += record[key]
+    self._interval_beats += 1
+
+  def flush(self):
+    # emit the record of the trend interval which is running
+    if self._interval_time == None:
+      return
+    record = {'time': self._interval_time, 'beats': self._interval_beats}
+    record.update({key: value / self._interval_beats for key, value in self._interval_sum.items()})
+    self._interval_time = None
+    self.emit(record)
+
+  def emit(self, record):
+    if self.on_record != None:
+      self.on_record(record)
+    else:
+      self.records.append(record)
+
+  def summary(self):
+    # the mean, standard deviation, minimum and maximum of every per beat value over all beats
+    summary = {}
+    for key, (count, total, squares, minimum, maximum) in self.totals.items():
+      mean = total / count
+      summary[key] = {'beats': count, 'mean': mean, 'sd': max(squares / count - mean * mean, 0) ** 0.5, 'min': minimum, 'max': maximum}
+    return summary
+
+  def get_trend(self, key):
+    # return the times and the values of a key of the stored records
+    time = np.array([record['time'] for record in self.records])
+    values = np.array([record.get(key, np.nan) for record in self.records])
+    return time, values
@@ -9,5 +9,5 @@ class Breathing:
     for key, value in args.items():
       setattr(self, key, value)
 
-  def model_step(self):
+  def model_step(self, elapsed = None):
     pass
\ No newline at end of file
@@ -1,4 +1,6 @@
 import math
+from collections import OrderedDict
+import numpy as np
 
 class Ecg:
   def __init__(self, model, **args):
@@ -31,6 +33,33 @@ class Ecg:
     self._p_wave_signal_counter = 0
     self._qrs_wave_signal_counter = 0
     self._t_wave_signal_counter = 0
+    self._p_signal = 0
+    self._qrs_signal = 0
+    self._t_signal = 0
+
+    # shape of the waves, every wave is a skewed gaussian with an amplitude, a width and a skew
+    self.amp_p = 0
+    self.width_p = 20
+    self.skew_p = 1
+    self.amp_q = 0
+    self.width_q = 20
+    self.skew_q = 1
+    self.amp_r = 0
+    self.width_r = 20
+    self.skew_r = 1
+    self.amp_s = 0
+    self.width_s = 20
+    self.skew_s = 1
+    self.amp_t = 0
+    self.width_t = 20
+    self.skew_t = 1
+
+    # wave templates of the running beat and the least recently used cache of the templates per timing and shape
+    self._p_template = ()
+    self._qrs_template = ()
+    self._t_template = ()
+    self._template_cache = OrderedDict()
+    self._template_cache_size = 64
 
     # set the independent properties
     for key, value in args.items():
@@ -115,6 +144,7 @@ class Ecg:
         else:
             # reset the p wave signal counter if pq is not running
             self._p_wave_signal_counter = 0
+            self._p_signal = 0
 
         # increase the qrs time counter if qrs time is running
         if self._qrs_running:
@@ -126,6 +156,7 @@ class Ecg:
         else:
             # reset the qrs wave signal counter if qrs is not running
             self._qrs_wave_signal_counter = 0
+            self._qrs_signal = 0
 
         # increase the qt time counter if qt time is running
         if self._qt_running:
@@ -137,10 +168,10 @@ class Ecg:
         else:
             # reset the t wave signal counter if qt is not running
             self._t_wave_signal_counter = 0
+            self._t_signal = 0
 
-        # if nothing is running, so there's no electrical activity then reset the ecg signal
-        if self._qt_running == False and self._qrs_running == False and self._qt_running == False:
-            self.ecg_signal = 0
+        # the ecg signal is the sum of the running waves, so it is zero when there's no electrical activity
+        self.ecg_signal = self._p_signal + self._qrs_signal + self._t_signal
 
         # calculate the measured heart_rate based on the ventricular rate every 5 seconds
         if self._measured_hr_time_counter > 5:
@@ -163,10 +194,62 @@ class Ecg:
             return self.qt_time * math.sqrt(60.0 / 10.0)
 
   def buildDynamicPWave(self):
-        pass
+        # select the p wave template at the start of the wave (or after a checkpoint was restored)
+        if self._p_wave_signal_counter == 1 or not self._p_template:
+            self._p_template = self.wave_template('p', self.pq_time, [(0.0, 1.0, self.amp_p, self.width_p, self.skew_p)])
+        self._p_signal = self.template_value(self._p_template, self._p_wave_signal_counter)
 
   def buildQRSWave(self):
-        pass
+        # select the qrs complex template at the start of the complex, the q, r and s waves each take a third of the qrs time
+        if self._qrs_wave_signal_counter == 1 or not self._qrs_template:
+            self._qrs_template = self.wave_template('qrs', self.qrs_time, [
+                (0.0, 1 / 3, self.amp_q, self.width_q, self.skew_q),
+                (1 / 3, 2 / 3, self.amp_r, self.width_r, self.skew_r),
+                (2 / 3, 1.0, self.amp_s, self.width_s, self.skew_s)
+            ])
+        self._qrs_signal = self.template_value(self._qrs_template, self._qrs_wave_signal_counter)
 
   def buildDynamicTWave(self):
-        pass
\ No newline at end of file
+        # select the t wave template at the start of the wave, the t wave follows the heart rate corrected qt time
+        if self._t_wave_signal_counter == 1 or not self._t_template:
+            self._t_template = self.wave_template('t', self.cqt_time, [(0.0, 1.0, self.amp_t, self.width_t, self.skew_t)])
+        self._t_signal = self.template_value(self._t_template, self._t_wave_signal_counter)
+
+  def template_value(self, template, counter):
+        # the wave is flat after the end of the template
+        if counter <= len(template):
+            return template[counter - 1]
+        return 0
+
+  def wave_template(self, wave, duration, segments):
+        # return the cached template of a wave with this duration and shape
+        key = (wave, duration, self._t, tuple(segments))
+        template = self._template_cache.get(key)
+        if template is not None:
+            self._template_cache.move_to_end(key)
+            return template
+
+        template = self.build_template(duration, segments)
+
+        # store the template and evict the least recently used template when the cache is full
+        self._template_cache[key] = template
+        if len(self._template_cache) > self._template_cache_size:
+            self._template_cache.popitem(last=False)
+
+        return template
+
+  def build_template(self, duration, segments):
+        # sample the wave at every model step of the duration
+        no_samples = max(int(round(duration / self._t)) + 1, 1)
+        time = np.arange(no_samples) * self._t
+        signal = np.zeros(no_samples)
+
+        for start, end, amp, width, skew in segments:
+            # every segment is a skewed gaussian centered in its part of the duration, a skew above 1 steepens the rising flank
+            segment_duration = (end - start) * duration
+            if segment_duration <= 0:
+                continue
+            u = (time - (start + end) / 2 * duration) / segment_duration
+            signal += amp * np.exp(-width * u * u * np.where(u < 0, skew, 1.0))
+
+        return tuple(signal.tolist())
@@ -19,40 +19,73 @@ class Heart:
     # get the modeling stepsize from the model
     self._t = model.modeling_stepsize
 
+    # activation function tables indexed by the activation counters of the ecg model and the timings they were built for
+    self._atrial_table = ()
+    self._atrial_key = None
+    self._ventricular_table = ()
+    self._ventricular_key = None
+
+    # references to the ecg model and the heart chambers (set on the first model step)
+    self._ecg_model = None
+
   def model_step(self):
     if (self.is_enabled):
       self.model_cycle()
 
   def model_cycle(self):
-    self.ecg_model = self.model.models['ecg']
-
     # get the relevant timings from the ecg model
-    ncc_atrial = self.ecg_model.ncc_atrial
-    atrial_duration = self.ecg_model.pq_time
-    ncc_ventricular = self.ecg_model.ncc_ventricular
-    ventricular_duration = self.ecg_model.cqt_time + self.ecg_model.qrs_time
+    if self._ecg_model is None:
+      self.connect()
+    ecg_model = self._ecg_model
+    ncc_atrial = ecg_model.ncc_atrial
+    ncc_ventricular = ecg_model.ncc_ventricular
 
-    # varying elastance activation function of the atria
-    if ncc_atrial >= 0 and (ncc_atrial < atrial_duration / self._t):
+    # rebuild the activation tables when the timings, the shape factor or the stepsize change
+    atrial_key = (ecg_model.pq_time, self.a, self._t)
+    if atrial_key != self._atrial_key:
+      self._atrial_key = atrial_key
+      self._atrial_table = self.activation_table(ecg_model.pq_time)
+
+    ventricular_key = (ecg_model.cqt_time, ecg_model.qrs_time, self.a, self._t)
+    if ventricular_key != self._ventricular_key:
+      self._ventricular_key = ventricular_key
+      self._ventricular_table = self.activation_table(ecg_model.cqt_time + ecg_model.qrs_time)
 
-      s = math.sin((ncc_atrial * self._t * math.pi) /  atrial_duration)
-      self.aaf = math.sin((ncc_atrial * self._t * math.pi) / atrial_duration - s / self.a)
-      
+    # varying elastance activation function of the atria
+    if 0 <= ncc_atrial < len(self._atrial_table):
+      self.aaf = self._atrial_table[ncc_atrial]
     else:
       self.aaf = 0
 
     # varying elastance activation function of the ventricles
-    if ncc_ventricular >= 0 and (ncc_ventricular < ventricular_duration / self._t):
-
-      s = math.sin((ncc_ventricular * self._t * math.pi) /  ventricular_duration)
-      self.vaf = math.sin((ncc_ventricular * self._t * math.pi) / ventricular_duration - s / self.a)
-
+    if 0 <= ncc_ventricular < len(self._ventricular_table):
+      self.vaf = self._ventricular_table[ncc_ventricular]
     else:
       self.vaf = 0
 
     # transfer the activation function to the heart compartments
-    self.model.time_varying_elastances['RA'].varying_elastance_factor = self.aaf
-    self.model.time_varying_elastances['RV'].varying_elastance_factor = self.vaf
-    self.model.time_varying_elastances['LA'].varying_elastance_factor = self.aaf
-    self.model.time_varying_elastances['LV'].varying_elastance_factor = self.vaf
-  
\ No newline at end of file
+    factor = self._elastance_factor
+    factor[self._ra] = self.aaf
+    factor[self._la] = self.aaf
+    factor[self._rv] = self.vaf
+    factor[self._lv] = self.vaf
+
+  def connect(self):
+    # store direct references to the ecg model and to the slots of the heart chambers in the network
+    self._ecg_model = self.model.models['ecg']
+    network = self.model.network
+    self._elastance_factor = network.comp['varying_elastance_factor']
+    self._ra = network.compartment_index['RA']
+    self._la = network.compartment_index['LA']
+    self._rv = network.compartment_index['RV']
+    self._lv = network.compartment_index['LV']
+
+  def activation_table(self, duration):
+    # varying elastance activation function for every activation counter value within the duration
+    table = []
+    ncc = 0
+    while ncc < duration / self._t:
+      s = math.sin((ncc * self._t * math.pi) / duration)
+      table.append(math.sin((ncc * self._t * math.pi) / duration - s / self.a))
+      ncc += 1
+    return tuple(table)
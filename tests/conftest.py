@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# the tests import the modules from the root of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFINITION = os.path.join(ROOT, 'definitions', 'normal_neonate_24h.json')
+
+
+@pytest.fixture
+def model():
+  from explain import Model
+  return Model(DEFINITION)
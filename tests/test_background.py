@@ -0,0 +1,24 @@
+import time
+
+def test_pause_does_not_count_as_calculation_time(model):
+  run = model.io.calculate_in_background(10, chunk_duration=0.1)
+  while run.steps_done == 0:
+    time.sleep(0.001)
+  run.pause()
+  time.sleep(0.05)
+  paused_duration = run.run_duration
+  time.sleep(0.5)
+  assert run.state == 'paused'
+  assert run.run_duration == paused_duration
+
+  run.resume()
+  assert run.wait(30)
+  assert run.state == 'finished'
+  assert run.progress()['model_time'] == 10
+
+def test_cancel_stops_at_a_chunk_boundary(model):
+  run = model.io.calculate_in_background(60, chunk_duration=0.1)
+  run.cancel()
+  assert run.wait(30)
+  assert run.state == 'cancelled'
+  assert run.steps_done < run.total_steps
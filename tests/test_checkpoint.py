@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from explain import Model
+from conftest import DEFINITION
+
+@pytest.mark.parametrize('integrator', ['euler', 'rk4', 'rk45', 'implicit'])
+def test_restored_run_matches_uninterrupted_run(tmp_path, integrator):
+  path = tmp_path / 'checkpoint.npz'
+
+  # a ramp which is running when the checkpoint is saved and a change which is still waiting
+  model = Model(DEFINITION)
+  model.set_integrator(integrator)
+  model.io.dc.add_to_watchlist(model.properties.find('AA.pres'))
+  model.io.schedule_prop_change('AA.el_base', 30000.0, 2.0, 0.5)
+  model.io.schedule_prop_change('ecg.heart_rate', 140.0, 0.5, 1.5)
+  model.calculate(1.0)
+  model.save_checkpoint(path)
+  saved = model.io.dc.no_samples
+  model.calculate(2.0)
+
+  restored = Model(DEFINITION)
+  restored.load_checkpoint(path)
+  assert type(restored.integrator) == type(model.integrator)
+  assert len(restored.io.scheduler.pending()) == 2
+  restored.calculate(2.0)
+
+  assert restored.model_clock == model.model_clock
+  for name in ['comp', 'conn']:
+    for prop, values in getattr(model.network, name).items():
+      assert np.array_equal(getattr(restored.network, name)[prop], values), prop
+  assert restored.models['ecg'].heart_rate == model.models['ecg'].heart_rate == 140.0
+  assert np.array_equal(restored.io.dc.get_time(), model.io.dc.get_time()[saved:])
+  assert np.array_equal(restored.io.dc.get_data('AA.pres'), model.io.dc.get_data('AA.pres')[saved:])
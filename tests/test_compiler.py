@@ -0,0 +1,39 @@
+import copy
+import json
+
+import pytest
+
+from conftest import DEFINITION
+from engine.compiler import DefinitionError, compile_definition
+
+def load_definition():
+  with open(DEFINITION) as file:
+    return json.load(file)
+
+def test_unresolved_connector_reference_fails_at_compile_time():
+  definition = load_definition()
+  resistor = next(c for c in definition['components'] if c['type'] == 'resistor')
+  resistor['comp_to'] = 'MISSING'
+  with pytest.raises(DefinitionError, match='MISSING'):
+    compile_definition(definition)
+
+def test_elements_are_built_from_the_compiled_topology(model):
+  for valve in model.valves.values():
+    assert valve.comp1.name == valve.comp_from
+    assert valve.comp2.name == valve.comp_to
+  # the compiled definition is not shared with the elements
+  topology = model.compiled_definition['topology']
+  saved = copy.deepcopy(topology['conn_attributes'])
+  next(iter(model.resistors.values())).description = 'changed'
+  assert topology['conn_attributes'] == saved
+
+def test_definition_changed_in_place_is_compiled_again(model):
+  aa = next(c for c in model.model_definition['components'] if c['name'] == 'AA')
+  aa['el_base'] = 99999
+  model.initialize(model.model_definition)
+  assert model.compliances['AA'].el_base == 99999
+
+def test_unchanged_definition_reuses_the_compiled_definition(model):
+  compiled = model.compiled_definition
+  model.initialize(model.model_definition)
+  assert model.compiled_definition is compiled
@@ -0,0 +1,13 @@
+import pytest
+
+@pytest.mark.parametrize('steps_before', [0, 3, 7])
+def test_sampling_restarts_when_the_data_is_cleared(model, steps_before):
+  # the samples after clearing don't depend on the model steps taken before
+  dc = model.io.dc
+  if steps_before > 0:
+    model.calculate(steps_before * model.modeling_stepsize)
+  dc.clear_data()
+  start = model.model_clock
+  model.calculate(0.05)
+  assert dc.no_samples == 9
+  assert dc.get_time()[0] == pytest.approx(start + dc.sample_interval)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from explain import Model
+from conftest import DEFINITION
+
+VARIANTS = [{}, {'LV.el_max': 20000, 'ecg.heart_rate': 140}, {'AA_AAR.r_for': 500, 'DA.no_flow': True}]
+LABELS = ['LV.vol', 'AA.pres', 'LV_AA.flow']
+
+def test_variants_match_separate_models():
+  ensemble = Model(DEFINITION).ensemble(VARIANTS)
+  ensemble.add_to_watchlist(LABELS)
+  ensemble.calculate(2)
+
+  for variant, overrides in enumerate(VARIANTS):
+    model = Model(DEFINITION)
+    for prop, value in overrides.items():
+      model.properties.find(prop)['set'](value)
+    for label in LABELS:
+      model.io.dc.add_to_watchlist(model.properties.find(label))
+    model.calculate(2)
+
+    data = ensemble.get_variant_data(variant)
+    assert np.array_equal(data['time'], model.io.dc.get_time())
+    for label in LABELS:
+      assert data[label] == pytest.approx(model.io.dc.get_data(label), rel=1e-12, abs=1e-15), label
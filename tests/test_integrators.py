@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+from engine.integrators import IntegrationError
+
+def test_rk4_stays_finite_at_the_modeling_stepsize(model):
+  model.set_integrator('rk4')
+  model.calculate(1)
+  assert np.isfinite(model.network.comp['vol']).all()
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_rk4_raises_when_the_step_is_too_large(model):
+  model.set_integrator('rk4', step_ticks=4)
+  with pytest.raises(IntegrationError, match='step of 4 model steps'):
+    model.calculate(2)
@@ -0,0 +1,20 @@
+import pytest
+
+# the left ventricle and the aorta every half second (time, LV.vol, LV.pres, AA.vol, AA.pres), calculated with the element by element euler step of the model before the network was stored in arrays
+BASELINE = [
+  (0.5, 0.01047880778874343, 5.0902938214793485, 0.0047382470511378475, 50.2203473284027),
+  (1.0, 0.009649376710183863, 4.685941596366203, 0.00485153829369115, 53.420148878690796),
+  (1.5, 0.009965251928588567, 4.839320218702084, 0.004871473531422503, 53.98318617405129),
+  (2.0, 0.010169941423250485, 4.938750419001119, 0.0049098398733318765, 55.066838318292156),
+  (2.5, 0.01030254230508992, 5.003182946654305, 0.004946907211825932, 56.1137905276227),
+  (3.0, 0.010384858753755149, 5.043193718333325, 0.004976903030867343, 56.961004499708686)
+]
+
+def test_euler_step_matches_the_baseline(model):
+  lv = model.time_varying_elastances['LV']
+  aa = model.compliances['AA']
+  for time, lv_vol, lv_pres, aa_vol, aa_pres in BASELINE:
+    model.calculate(0.5)
+    assert model.model_clock == pytest.approx(time)
+    # only the order of the floating point operations differs from the baseline
+    assert (lv.vol, lv.pres, aa.vol, aa.pres) == pytest.approx((lv_vol, lv_pres, aa_vol, aa_pres), rel=1e-9)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from explain import Model
+from conftest import DEFINITION
+
+def run_profiled(breakdown, integrator = 'euler', seconds = 2):
+  model = Model(DEFINITION)
+  model.set_integrator(integrator)
+  if breakdown != None:
+    model.enable_profiling(breakdown)
+  model.calculate(seconds)
+  return model
+
+@pytest.mark.parametrize('breakdown', [False, True])
+def test_profiling_keeps_the_results(breakdown):
+  reference = run_profiled(None)
+  model = run_profiled(breakdown)
+  for name in ['comp', 'conn']:
+    for prop, values in getattr(reference.network, name).items():
+      assert np.array_equal(getattr(model.network, name)[prop], values), prop
+
+def test_valve_and_resistor_flows_are_timed_separately():
+  phases = {phase['name'] for phase in run_profiled(False).profiler.results()['phases']}
+  assert {'network.pressures', 'network.valve_flows', 'network.resistor_flows', 'interface.datacollector'} <= phases
+
+def test_breakdown_times_every_component():
+  model = run_profiled(True)
+  phases = {phase['name'] for phase in model.profiler.results()['phases']}
+  assert {'compartments.' + name for name in model.network.compartment_index} <= phases
+  assert {'valves.' + name for name in model.valves} <= phases
+  assert {'resistors.' + name for name in model.resistors} <= phases
+
+def test_switches_reach_the_profiled_flows():
+  model = Model(DEFINITION)
+  model.enable_profiling()
+  model.valves['LV_AA'].no_flow = True
+  model.calculate(0.5)
+  assert model.valves['LV_AA'].flow == 0
+
+def test_integrators_collect_samples_while_profiling():
+  model = run_profiled(False, 'rk4')
+  timings = model.profiler.timings
+  assert timings['interface.datacollector'][0] > 0
+  assert timings['integrator.samples'][0] > 0
@@ -0,0 +1,23 @@
+import asyncio
+
+def collect_blocks(model, duration):
+  async def main():
+    runner = model.io.realtime(1000, chunk_duration=0.02)
+    return [block async for block in runner.stream(duration)]
+  return asyncio.run(main())
+
+def test_realtime_blocks_in_memory(model):
+  model.io.dc.add_to_watchlist(model.properties.find('AA.pres'))
+  blocks = collect_blocks(model, 0.2)
+  assert [len(block['time']) for block in blocks][1:] == [4] * 9
+  assert model.io.dc.no_samples == 0
+
+def test_realtime_blocks_with_recording_file(model, tmp_path):
+  model.io.record_to_file(str(tmp_path / 'run.rec'))
+  model.io.dc.add_to_watchlist(model.properties.find('AA.pres'))
+  blocks = collect_blocks(model, 0.2)
+  # every block holds only the samples of its own chunk, the recording file holds all of them
+  sizes = [len(block['time']) for block in blocks]
+  assert sizes[1:] == [4] * 9
+  assert sum(sizes) == model.io.dc.no_samples
+  assert list(blocks[1]['time']) == list(model.io.dc.get_time()[sizes[0]:sizes[0] + 4])
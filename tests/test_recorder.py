@@ -0,0 +1,40 @@
+import threading
+
+import numpy as np
+
+from explain import Model
+from interface.recorder import Recording
+from conftest import DEFINITION
+
+LABELS = ['LV.vol', 'AA.pres', 'LV_AA.flow']
+
+def watch(model):
+  for label in LABELS:
+    model.io.dc.add_to_watchlist(model.properties.find(label))
+
+def test_recording_matches_the_datacollector(model, tmp_path):
+  path = tmp_path / 'run.rec'
+  threads = threading.active_count()
+
+  # the file and the writer are only started with the first sample, not for every change of the watch list
+  model.io.record_to_file(str(path), chunk_size=64)
+  watch(model)
+  assert threading.active_count() == threads
+  assert not path.exists()
+
+  model.calculate(1.0)
+  assert threading.active_count() == threads + 1
+
+  # switching back to memory closes the file and joins the writer
+  model.io.record_in_memory()
+  assert threading.active_count() == threads
+
+  reference = Model(DEFINITION)
+  watch(reference)
+  reference.calculate(1.0)
+
+  recording = Recording(str(path))
+  assert recording.no_samples == reference.io.dc.no_samples
+  assert np.array_equal(recording.get_time(), reference.io.dc.get_time())
+  for label in LABELS:
+    assert np.array_equal(recording.get_data(label), reference.io.dc.get_data(label)), label
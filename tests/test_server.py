@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from interface.server import read_frame
+
+async def subscribe_and_count(port, props, delay):
+  await asyncio.sleep(delay)
+  reader, writer = await asyncio.open_connection('127.0.0.1', port)
+  writer.write((json.dumps({'command': 'subscribe', 'props': props, 'interval': 0.005}) + '\n').encode())
+  no_samples = 0
+  try:
+    while True:
+      kind, payload = await read_frame(reader)
+      if kind == 'samples':
+        no_samples += len(payload[1])
+  except (asyncio.IncompleteReadError, ConnectionError):
+    pass
+  return no_samples
+
+def test_subscribing_while_blocks_are_queued(model):
+  # at a high realtime factor blocks of the previous watch list are still queued when a client subscribes
+  async def main():
+    server = model.io.stream_server(port=0, realtime_factor=1000)
+    serve = asyncio.ensure_future(server.serve(10))
+    while server.server is None:
+      await asyncio.sleep(0.001)
+    clients = [subscribe_and_count(server.port, props, delay) for props, delay in [(['AA.pres'], 0), (['LV.vol', 'RA.pres'], 0.01), (['LV.pres'], 0.02)]]
+    return await asyncio.gather(serve, *clients)
+
+  _, *counts = asyncio.run(main())
+  assert all(count > 0 for count in counts)
+
+def test_invalid_commands_get_an_error_reply(model):
+  # malformed commands are answered with an error and the connection stays usable
+  commands = [
+    {'command': 'subscribe', 'props': 'LV.vol'},
+    {'command': 'subscribe', 'props': [1]},
+    {'command': 'subscribe', 'props': ['LV.vol'], 'interval': 'x'},
+    {'command': 'subscribe', 'props': ['LV.vol'], 'policy': ['drop']},
+    {'command': 'prop_change', 'prop': 1, 'value': 1.0},
+    {'command': 'schedule_prop_change', 'prop': 'AA.el_base', 'value': 1.0, 'in_time': 'x'},
+    {'command': 'schedule_prop_change', 'prop': 'AA.el_base', 'value': 1.0, 'at_time': None},
+    {'command': 'subscribe', 'props': ['LV.vol']}
+  ]
+
+  async def main():
+    server = model.io.stream_server(port=0, realtime_factor=100)
+    serve = asyncio.ensure_future(server.serve(1))
+    while server.server is None:
+      await asyncio.sleep(0.001)
+    reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+    replies = []
+    for command in commands:
+      writer.write((json.dumps(command) + '\n').encode())
+      kind, payload = await read_frame(reader)
+      while kind != 'reply':
+        kind, payload = await read_frame(reader)
+      replies.append(payload)
+    server.stop()
+    await serve
+    return replies
+
+  replies = asyncio.run(main())
+  assert all('error' in reply for reply in replies[:-1])
+  assert replies[-1]['ok']
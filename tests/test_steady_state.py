@@ -0,0 +1,9 @@
+def test_run_until_steady_without_steps(model):
+  result = model.run_until_steady(max_time=model.modeling_stepsize / 2)
+  assert result == {'steady': False, 'beats': 0, 'time': 0, 'change': float('inf')}
+
+def test_run_until_steady_with_an_integrator(model, capsys):
+  model.set_integrator('implicit')
+  result = model.run_until_steady(max_time=5, min_beats=2, tolerance=0.5)
+  assert result['steady']
+  assert 'euler' in capsys.readouterr().out
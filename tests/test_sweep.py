@@ -0,0 +1,18 @@
+from conftest import DEFINITION
+from interface.sweep import Sweep
+
+def test_sweep_numeric_parameters():
+  results = Sweep(DEFINITION, duration=1, metrics=['AA.pres'], sample_interval=0.005, processes=1).grid({'ecg.heart_rate': [100, 140]})
+  assert list(results['ecg.heart_rate']) == [100.0, 140.0]
+  assert results['heart_rate'][1] > results['heart_rate'][0]
+
+def test_sweep_boolean_parameters():
+  results = Sweep(DEFINITION, duration=1, metrics=['AA.pres'], sample_interval=0.005, processes=1).grid({'LV_AA.no_flow': [False, True]})
+  assert list(results['LV_AA.no_flow']) == [False, True]
+  # a closed aortic valve lowers the aortic pressure
+  assert results['AA.pres.max'][1] < results['AA.pres.max'][0]
+
+def test_sweep_default_metrics_are_not_shared():
+  first = Sweep(DEFINITION)
+  first.metrics.append('AA.pres')
+  assert Sweep(DEFINITION).metrics == []
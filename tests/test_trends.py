@@ -0,0 +1,31 @@
+import pytest
+
+def run_trends(model, seconds = 5):
+  trends = model.io.collect_trends()
+  model.calculate(seconds)
+  model.io.stop_trends()
+  return trends
+
+def test_trends_with_euler(model):
+  trends = run_trends(model)
+  assert len(trends.records) >= 8
+  assert trends.records[-1]['heart_rate'] == pytest.approx(120, rel=0.05)
+
+def test_trends_with_profiling(model):
+  model.enable_profiling()
+  trends = run_trends(model)
+  assert len(trends.records) >= 8
+
+@pytest.mark.parametrize('integrator', ['rk4', 'rk45', 'implicit'])
+def test_trends_with_integrators(model, integrator):
+  euler = run_trends(model)
+  model.set_integrator(integrator)
+  trends = run_trends(model)
+  assert len(trends.records) >= 8
+  # the per beat values agree with the euler step
+  assert trends.records[-1]['AA.pres.mean'] == pytest.approx(euler.records[-1]['AA.pres.mean'], rel=0.05)
+
+def test_trend_records_are_bounded(model):
+  trends = model.io.collect_trends(max_records=3)
+  model.calculate(5)
+  assert len(trends.records) == 3